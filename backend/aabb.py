@@ -1,6 +1,18 @@
 import heapq
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from typing import List, Tuple
 
+import numpy as np
+
 # Axis-aligned bounding box (obstacle)
 class AABB:
     def __init__(self, xmin, ymin, zmin, xmax, ymax, zmax):
@@ -12,16 +24,165 @@ class AABB:
         return (self.xmin - radius <= x <= self.xmax + radius and
                 self.ymin - radius <= y <= self.ymax + radius)
 
-# A* pathfinding in 2D
+    @classmethod
+    def from_bbox(cls, bbox) -> "AABB":
+        """
+        Build from a part bbox: [x, y, w, h] footprint (unbounded in Z)
+        or [xmin, ymin, zmin, xmax, ymax, zmax]
+        """
+        if len(bbox) == 4:
+            x, y, w, h = bbox
+            return cls(x, y, -math.inf, x + w, y + h, math.inf)
+        return cls(*bbox)
+
+    def key(self) -> Tuple[float,float,float,float,float,float]:
+        return (self.xmin, self.ymin, self.zmin, self.xmax, self.ymax, self.zmax)
+
+# Uniform bucket grid over obstacle footprints for sublinear collision queries
+class ObstacleIndex:
+    def __init__(self, obstacles: List[AABB], radius: float = 0.0, cell: float = None):
+        """
+        Boxes are inflated by radius once at build time; every query is
+        against the inflated footprints. cell defaults to the mean box size.
+        """
+        self.obstacles = list(obstacles)
+        self.radius = radius
+        r = radius
+        self.boxes = np.array([[o.xmin - r, o.ymin - r, o.xmax + r, o.ymax + r]
+                               for o in self.obstacles], dtype=float).reshape(-1, 4)
+        if cell is None:
+            sizes = np.maximum(self.boxes[:, 2] - self.boxes[:, 0],
+                               self.boxes[:, 3] - self.boxes[:, 1])
+            cell = float(sizes.mean()) if len(sizes) else 50.0
+        self.cell = max(cell, 1e-6)
+
+        buckets = {}
+        for k, (x0, y0, x1, y1) in enumerate(self.boxes):
+            bx0, by0 = self._bucket(x0, y0)
+            bx1, by1 = self._bucket(x1, y1)
+            for bx in range(bx0, bx1 + 1):
+                for by in range(by0, by1 + 1):
+                    buckets.setdefault((bx, by), []).append(k)
+        self.buckets = {key: np.array(ids, dtype=np.int64) for key, ids in buckets.items()}
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def _bucket(self, x: float, y: float) -> Tuple[int,int]:
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def _candidates(self, bx0, by0, bx1, by1) -> np.ndarray:
+        ids = [self.buckets[(bx, by)]
+               for bx in range(bx0, bx1 + 1) for by in range(by0, by1 + 1)
+               if (bx, by) in self.buckets]
+        if not ids:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(ids))
+
+    def contains_xy(self, x: float, y: float) -> bool:
+        """Check if (x,y) lies inside any inflated obstacle footprint"""
+        ids = self.buckets.get(self._bucket(x, y))
+        if ids is None:
+            return False
+        b = self.boxes[ids]
+        return bool(np.any((b[:, 0] <= x) & (x <= b[:, 2]) & (b[:, 1] <= y) & (y <= b[:, 3])))
+
+    def query_points(self, points) -> np.ndarray:
+        """Batched contains_xy: (N,2) array of points -> (N,) bool array"""
+        pts = np.asarray(points, dtype=float).reshape(-1, 2)
+        hits = np.zeros(len(pts), dtype=bool)
+        if not len(pts) or not self.buckets:
+            return hits
+        keys = np.floor(pts / self.cell).astype(np.int64)
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for u, (bx, by) in enumerate(uniq):
+            ids = self.buckets.get((int(bx), int(by)))
+            if ids is None:
+                continue
+            sel = np.nonzero(inverse == u)[0]
+            p = pts[sel]
+            b = self.boxes[ids]
+            inside = ((b[None, :, 0] <= p[:, None, 0]) & (p[:, None, 0] <= b[None, :, 2]) &
+                      (b[None, :, 1] <= p[:, None, 1]) & (p[:, None, 1] <= b[None, :, 3]))
+            hits[sel] = inside.any(axis=1)
+        return hits
+
+    def query_box(self, box: AABB) -> List[AABB]:
+        """Obstacles whose inflated footprint overlaps box in XY"""
+        bx0, by0 = self._bucket(box.xmin, box.ymin)
+        bx1, by1 = self._bucket(box.xmax, box.ymax)
+        ids = self._candidates(bx0, by0, bx1, by1)
+        b = self.boxes[ids]
+        overlap = ((b[:, 0] <= box.xmax) & (box.xmin <= b[:, 2]) &
+                   (b[:, 1] <= box.ymax) & (box.ymin <= b[:, 3]))
+        return [self.obstacles[k] for k in ids[overlap]]
+
+    def segment_hits(self, p0: Tuple[float,float], p1: Tuple[float,float]) -> bool:
+        """Check if the XY segment p0->p1 crosses any inflated obstacle footprint"""
+        (x0, y0), (x1, y1) = p0, p1
+        dx, dy = x1 - x0, y1 - y0
+        # walk bucket columns, clipping the segment's y range to each column
+        bx0, bx1 = sorted((self._bucket(x0, 0)[0], self._bucket(x1, 0)[0]))
+        ids = []
+        for bx in range(bx0, bx1 + 1):
+            if dx:
+                lo = max(min(x0, x1), bx * self.cell)
+                hi = min(max(x0, x1), (bx + 1) * self.cell)
+                ya = y0 + (lo - x0) / dx * dy
+                yb = y0 + (hi - x0) / dx * dy
+            else:
+                ya, yb = y0, y1
+            by0, by1 = sorted((self._bucket(0, ya)[1], self._bucket(0, yb)[1]))
+            for by in range(by0, by1 + 1):
+                if (bx, by) in self.buckets:
+                    ids.append(self.buckets[(bx, by)])
+        if not ids:
+            return False
+        b = self.boxes[np.unique(np.concatenate(ids))]
+
+        # slab test against every candidate box at once
+        tmin = np.zeros(len(b))
+        tmax = np.ones(len(b))
+        for d, o, lo, hi in ((dx, x0, b[:, 0], b[:, 2]), (dy, y0, b[:, 1], b[:, 3])):
+            if d == 0:
+                outside = (o < lo) | (o > hi)
+                tmax = np.where(outside, -1.0, tmax)
+            else:
+                t1, t2 = (lo - o) / d, (hi - o) / d
+                tmin = np.maximum(tmin, np.minimum(t1, t2))
+                tmax = np.minimum(tmax, np.maximum(t1, t2))
+        return bool(np.any(tmin <= tmax))
+
+def obstacle_index(obstacles, radius: float = 0.0) -> ObstacleIndex:
+    """Reuse obstacles if it is already an index for this radius, else build one"""
+    if isinstance(obstacles, ObstacleIndex):
+        if obstacles.radius == radius:
+            return obstacles
+        obstacles = obstacles.obstacles
+    return ObstacleIndex(obstacles, radius=radius)
+
+def path_is_clear(path: List[Tuple[float,...]], obstacles, radius: float = 0.0) -> bool:
+    """Validate that every XY leg of path stays clear of the (inflated) obstacles"""
+    index = obstacle_index(obstacles, radius)
+    for a, b in zip(path, path[1:]):
+        if index.segment_hits(a[:2], b[:2]):
+            return False
+    return True
+
+# A* pathfinding in 2D (obstacles: list of AABB or an ObstacleIndex)
 def astar_2d(start: Tuple[float,float], goal: Tuple[float,float],
-             obstacles: List[AABB], bounds, step: float = 5.0, radius: float = 2.0):
+             obstacles, bounds, step: float = 5.0, radius: float = 2.0,
+             stats: dict = None):
     (xmin, xmax), (ymin, ymax) = bounds
+    index = obstacle_index(obstacles, radius)
     open_set = []
     heapq.heappush(open_set, (0, start))
     came_from = {}
     g_score = {start: 0}
     f_score = {start: abs(goal[0]-start[0]) + abs(goal[1]-start[1])}
 
+    expansions = 0
     while open_set:
         _, current = heapq.heappop(open_set)
         if abs(current[0]-goal[0]) < step and abs(current[1]-goal[1]) < step:
@@ -30,13 +191,16 @@ def astar_2d(start: Tuple[float,float], goal: Tuple[float,float],
             while current in came_from:
                 current = came_from[current]
                 path.append(current)
+            if stats is not None:
+                stats["expansions"] = expansions
             return path[::-1]
+        expansions += 1
 
         for dx, dy in [(step,0), (-step,0), (0,step), (0,-step)]:
             nx, ny = current[0]+dx, current[1]+dy
             if not (xmin <= nx <= xmax and ymin <= ny <= ymax):
                 continue
-            if any(obs.contains_xy(nx, ny, radius) for obs in obstacles):
+            if index.contains_xy(nx, ny):
                 continue
             neighbor = (nx, ny)
             tentative_g = g_score[current] + step
@@ -45,34 +209,675 @@ def astar_2d(start: Tuple[float,float], goal: Tuple[float,float],
                 g_score[neighbor] = tentative_g
                 f_score[neighbor] = tentative_g + abs(goal[0]-nx) + abs(goal[1]-ny)
                 heapq.heappush(open_set, (f_score[neighbor], neighbor))
+    if stats is not None:
+        stats["expansions"] = expansions
     return None
 
+# Occupancy grid: obstacles rasterized once onto the A* lattice
+class OccupancyGrid:
+    def __init__(self, obstacles, bounds, step: float = 5.0,
+                 radius: float = 2.0, origin: Tuple[float,float] = None):
+        """
+        Lattice points are origin + (i*step, j*step) inside bounds.
+        origin defaults to the bounds corner; pass the start point to get the
+        same lattice astar_2d walks.
+        """
+        (xmin, xmax), (ymin, ymax) = bounds
+        if isinstance(obstacles, ObstacleIndex):
+            obstacles = obstacles.obstacles
+        if origin is None:
+            origin = (xmin, ymin)
+        # first lattice point >= lower bound
+        self.x0 = origin[0] - math.floor((origin[0] - xmin) / step) * step
+        self.y0 = origin[1] - math.floor((origin[1] - ymin) / step) * step
+        self.step = step
+        self.radius = radius
+        self.nx = max(int(math.floor((xmax - self.x0) / step)) + 1, 0)
+        self.ny = max(int(math.floor((ymax - self.y0) / step)) + 1, 0)
+        self.blocked = np.zeros((self.nx, self.ny), dtype=bool)
+        # number of obstacles covering each lattice point, so boxes can be removed again
+        self.counts = np.zeros((self.nx, self.ny), dtype=np.int32)
+        for obs in obstacles:
+            self.add(obs)
+
+    def _span(self, lo: float, hi: float, o: float, n: int):
+        """Index range [i0, i1) of lattice points with lo <= o + i*step <= hi"""
+        i0 = max(int(math.ceil((lo - o) / self.step)), 0)
+        i1 = min(int(math.floor((hi - o) / self.step)) + 1, n)
+        return i0, i1
+
+    def _update(self, obs: AABB, delta: int) -> List[int]:
+        """Add delta to the coverage of obs; returns flat indices of points that flipped state"""
+        r = self.radius
+        i0, i1 = self._span(obs.xmin - r, obs.xmax + r, self.x0, self.nx)
+        j0, j1 = self._span(obs.ymin - r, obs.ymax + r, self.y0, self.ny)
+        if not (i0 < i1 and j0 < j1):
+            return []
+        counts = self.counts[i0:i1, j0:j1]
+        counts += delta
+        before = self.blocked[i0:i1, j0:j1].copy()
+        self.blocked[i0:i1, j0:j1] = counts > 0
+        ii, jj = np.nonzero(before != self.blocked[i0:i1, j0:j1])
+        return ((ii + i0) * self.ny + (jj + j0)).tolist()
+
+    def add(self, obs: AABB) -> List[int]:
+        """Mark every lattice point inside obs (inflated by radius) as blocked"""
+        return self._update(obs, 1)
+
+    def remove(self, obs: AABB) -> List[int]:
+        """Undo add(obs); points still covered by other obstacles stay blocked"""
+        return self._update(obs, -1)
+
+    def index(self, x: float, y: float) -> Tuple[int,int]:
+        return (int(round((x - self.x0) / self.step)),
+                int(round((y - self.y0) / self.step)))
+
+    def point(self, i: int, j: int) -> Tuple[float,float]:
+        return (self.x0 + i * self.step, self.y0 + j * self.step)
+
+# Raised by budgeted searches that run out of time or expansions before finding any path
+class PlanningBudgetExceeded(RuntimeError):
+    pass
+
+def _grid_search(grid: OccupancyGrid, start, goal, step: float, weight: float = 1.0,
+                 deadline: float = None, max_expansions: int = None):
+    """
+    (Weighted) A* on grid. Returns (status, path, lower_bound, expansions) where status is
+    "found", "unreachable" or "budget"; lower_bound is a lower bound on the optimal cost.
+    """
+    nx, ny = grid.nx, grid.ny
+    si, sj = grid.index(*start)
+    if not (0 <= si < nx and 0 <= sj < ny):
+        return "unreachable", None, None, 0
+
+    gx, gy = goal
+    blocked = grid.blocked.ravel()
+    g_score = np.full(nx * ny, np.inf)
+    came_from = np.full(nx * ny, -1, dtype=np.int64)
+    # goal test matches astar_2d: within one step on both axes
+    goal_i = (gx - grid.x0) / step
+    goal_j = (gy - grid.y0) / step
+    # lattice points passing that test lie between these, for lower bounds on the cost to them
+    gi0, gi1 = math.floor(goal_i), math.ceil(goal_i)
+    gj0, gj1 = math.floor(goal_j), math.ceil(goal_j)
+
+    s = si * ny + sj
+    g_score[s] = 0.0
+    open_set = [(0.0, s)]
+    expansions = 0
+    while open_set:
+        _, current = heapq.heappop(open_set)
+        ci, cj = divmod(current, ny)
+        if abs(ci - goal_i) < 1 and abs(cj - goal_j) < 1:
+            cost = g_score[current]
+            lower = cost
+            for _, o in open_set:
+                oi, oj = divmod(o, ny)
+                to_goal = max(gi0 - oi, oi - gi1, 0) + max(gj0 - oj, oj - gj1, 0)
+                lower = min(lower, g_score[o] + to_goal * step)
+            path = []
+            while current != -1:
+                path.append(grid.point(*divmod(int(current), ny)))
+                current = came_from[current]
+            path[-1] = start
+            return "found", path[::-1], float(lower), expansions
+
+        expansions += 1
+        if max_expansions is not None and expansions > max_expansions:
+            return "budget", None, None, expansions
+        if deadline is not None and not expansions % 256 and time.monotonic() > deadline:
+            return "budget", None, None, expansions
+
+        tentative_g = g_score[current] + step
+        for di, dj in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            ni, nj = ci + di, cj + dj
+            if not (0 <= ni < nx and 0 <= nj < ny):
+                continue
+            neighbor = ni * ny + nj
+            if blocked[neighbor]:
+                continue
+            if tentative_g < g_score[neighbor]:
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                # same summation order as astar_2d so ties break identically
+                f = (tentative_g + weight * abs(gx - (grid.x0 + ni * step))
+                     + weight * abs(gy - (grid.y0 + nj * step)))
+                heapq.heappush(open_set, (f, neighbor))
+    return "unreachable", None, None, expansions
+
+# A* over an occupancy grid: same lattice and result as astar_2d, array lookups only
+def astar_grid(start: Tuple[float,float], goal: Tuple[float,float],
+               obstacles, bounds, step: float = 5.0, radius: float = 2.0,
+               grid: OccupancyGrid = None, stats: dict = None):
+    if grid is None:
+        grid = OccupancyGrid(obstacles, bounds, step=step, radius=radius, origin=start)
+    _, path, _, expansions = _grid_search(grid, start, goal, step)
+    if stats is not None:
+        stats["expansions"] = expansions
+    return path
+
+# Anytime weighted A*: quick inflated-heuristic path first, then tighten while budget remains
+def anytime_astar(start: Tuple[float,float], goal: Tuple[float,float],
+                  obstacles, bounds, step: float = 5.0, radius: float = 2.0,
+                  weight: float = 3.0, max_time: float = None, max_expansions: int = None,
+                  grid: OccupancyGrid = None, stats: dict = None):
+    """
+    Returns (path, bound): the best path found within the budget and a bound such that
+    its cost <= bound * optimal cost, or (None, None) if the goal is unreachable.
+    Raises PlanningBudgetExceeded if the budget runs out before any path is found.
+    """
+    if grid is None:
+        grid = OccupancyGrid(obstacles, bounds, step=step, radius=radius, origin=start)
+    deadline = None if max_time is None else time.monotonic() + max_time
+    remaining = max_expansions
+    best, bound = None, None
+    w = max(weight, 1.0)
+    if stats is not None:
+        stats["expansions"] = 0
+    while True:
+        status, path, lower, expansions = _grid_search(grid, start, goal, step, weight=w,
+                                                       deadline=deadline, max_expansions=remaining)
+        if stats is not None:
+            stats["expansions"] += expansions
+        if status == "unreachable":
+            return None, None
+        if status == "budget":
+            if best is None:
+                limit = f"{max_time}s" if deadline is not None and time.monotonic() > deadline \
+                    else f"{max_expansions} expansions"
+                raise PlanningBudgetExceeded(
+                    f"No path found within {limit} (weight {w:g}, {expansions} cells expanded)")
+            return best, bound
+        cost = (len(path) - 1) * step
+        best, bound = path, min(w, cost / lower) if lower else 1.0
+        if w == 1.0 or bound <= 1.0:
+            return best, bound
+        if remaining is not None:
+            remaining -= expansions
+        w = 1.0 + (w - 1.0) / 2
+        if w < 1.05:
+            w = 1.0
+
+def astar_anytime(start: Tuple[float,float], goal: Tuple[float,float],
+                  obstacles, bounds, step: float = 5.0, radius: float = 2.0,
+                  max_time: float = 0.5, stats: dict = None):
+    """plan_path engine: anytime_astar with a wall-clock budget, path only"""
+    path, bound = anytime_astar(start, goal, obstacles, bounds, step=step, radius=radius,
+                                max_time=max_time, stats=stats)
+    if stats is not None:
+        stats["bound"] = bound
+    if path is not None:
+        logging.debug(f"astar_anytime: {len(path)} waypoints, cost within {bound:.2f}x of optimal")
+    return path
+
+# Incremental replanning (LPA*) on an occupancy grid with fixed start and goal
+class IncrementalPlanner:
+    def __init__(self, start: Tuple[float,float], goal: Tuple[float,float],
+                 obstacles, bounds, step: float = 5.0, radius: float = 2.0):
+        """
+        Keeps g/rhs values between calls so that update() only re-expands
+        cells whose shortest path is affected by added/removed obstacles.
+        Same lattice and goal test as astar_grid: the start cell is never
+        blocked and the goal is any lattice point within one step of goal.
+        """
+        if isinstance(obstacles, ObstacleIndex):
+            obstacles = obstacles.obstacles
+        self.start = start
+        self.grid = OccupancyGrid(obstacles, bounds, step=step, radius=radius, origin=start)
+        self.step = step
+        self._boxes = Counter(obs.key() for obs in obstacles)
+        nx, ny = self.grid.nx, self.grid.ny
+        n = nx * ny
+        si, sj = self.grid.index(*start)
+        if not (0 <= si < nx and 0 <= sj < ny):
+            raise ValueError("start outside workspace")
+        goal_i = (goal[0] - self.grid.x0) / step
+        goal_j = (goal[1] - self.grid.y0) / step
+        self.s_start = si * ny + sj
+        self.goals = [i * ny + j
+                      for i in range(max(math.floor(goal_i), 0), min(math.ceil(goal_i), nx - 1) + 1)
+                      for j in range(max(math.floor(goal_j), 0), min(math.ceil(goal_j), ny - 1) + 1)
+                      if abs(i - goal_i) < 1 and abs(j - goal_j) < 1]
+        self._blocked = self.grid.blocked.ravel()  # view, follows grid.add/remove
+        self.g = [math.inf] * n
+        self.rhs = [math.inf] * n
+        self.rhs[self.s_start] = 0.0
+        self.expanded = 0
+        self._queue = []
+        self._keys = {}
+        self._push(self.s_start)
+        self._path = None
+        self._dirty = True
+
+    def _h(self, s: int) -> float:
+        i, j = divmod(s, self.grid.ny)
+        return min((abs(i - gi) + abs(j - gj) for gi, gj in (divmod(g, self.grid.ny) for g in self.goals)),
+                   default=0) * self.step
+
+    def _key(self, s: int):
+        m = min(self.g[s], self.rhs[s])
+        return (m + self._h(s), m)
+
+    def _push(self, s: int):
+        key = self._key(s)
+        self._keys[s] = key
+        heapq.heappush(self._queue, (key, s))
+
+    def _top_key(self):
+        # drop stale heap entries (lazy deletion)
+        while self._queue and self._keys.get(self._queue[0][1]) != self._queue[0][0]:
+            heapq.heappop(self._queue)
+        return self._queue[0][0] if self._queue else (math.inf, math.inf)
+
+    def _neighbors(self, s: int):
+        nx, ny = self.grid.nx, self.grid.ny
+        i, j = divmod(s, ny)
+        if i > 0: yield s - ny
+        if i < nx - 1: yield s + ny
+        if j > 0: yield s - 1
+        if j < ny - 1: yield s + 1
+
+    def _cost(self, u: int, v: int) -> float:
+        # a start inside an obstacle's margin may still be left, as in _grid_search
+        blocked = (self._blocked[u] and u != self.s_start) or (self._blocked[v] and v != self.s_start)
+        return math.inf if blocked else self.step
+
+    def _update_vertex(self, u: int):
+        if u != self.s_start:
+            self.rhs[u] = min((self.g[v] + self._cost(v, u) for v in self._neighbors(u)), default=math.inf)
+        self._keys.pop(u, None)
+        if self.g[u] != self.rhs[u]:
+            self._push(u)
+
+    def _compute(self):
+        while self.goals and (self._top_key() < min(self._key(g) for g in self.goals)
+                              or any(self.rhs[g] != self.g[g] for g in self.goals)):
+            if not self._queue:
+                break
+            _, u = heapq.heappop(self._queue)
+            del self._keys[u]
+            self.expanded += 1
+            if self.g[u] > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                for v in self._neighbors(u):
+                    self._update_vertex(v)
+            else:
+                self.g[u] = math.inf
+                self._update_vertex(u)
+                for v in self._neighbors(u):
+                    self._update_vertex(v)
+
+    def update(self, added: List[AABB] = (), removed: List[AABB] = ()):
+        """Apply obstacle changes (a moved part is removed + added) and mark affected cells"""
+        changed = set()
+        for obs in removed:
+            changed.update(self.grid.remove(obs))
+            self._boxes[obs.key()] -= 1
+        for obs in added:
+            changed.update(self.grid.add(obs))
+            self._boxes[obs.key()] += 1
+        self._boxes = +self._boxes
+        for c in changed:
+            self._update_vertex(c)
+            for v in self._neighbors(c):
+                self._update_vertex(v)
+        if changed:
+            self._dirty = True
+        return self.plan()
+
+    def sync(self, obstacles):
+        """update() with the difference between the planner's obstacles and these"""
+        if isinstance(obstacles, ObstacleIndex):
+            obstacles = obstacles.obstacles
+        boxes = Counter(obs.key() for obs in obstacles)
+        return self.update([AABB(*key) for key in (boxes - self._boxes).elements()],
+                           [AABB(*key) for key in (self._boxes - boxes).elements()])
+
+    def plan(self):
+        """Current shortest XY path as world points (start first), or None if unreachable"""
+        if not self._dirty:
+            return None if self._path is None else list(self._path)
+        self._compute()
+        self._dirty = False
+        self._path = None
+        if not self.goals:
+            return None
+        s = min(self.goals, key=lambda g: self.g[g])
+        if self.g[s] == math.inf:
+            return None
+        cells = [s]
+        while s != self.s_start:
+            s = min(self._neighbors(s), key=lambda v: self.g[v] + self._cost(v, s))
+            cells.append(s)
+        path = [self.grid.point(*divmod(c, self.grid.ny)) for c in reversed(cells)]
+        path[0] = self.start
+        self._path = path
+        return list(path)
+
+# Live planners of the "incremental" engine, one per route, least recently used dropped first
+INCREMENTAL_ROUTES = 64
+_incremental = OrderedDict()
+_incremental_lock = threading.Lock()
+
+def astar_incremental(start: Tuple[float,float], goal: Tuple[float,float],
+                      obstacles, bounds, step: float = 5.0, radius: float = 2.0,
+                      stats: dict = None):
+    """
+    plan_path engine: the route's IncrementalPlanner is kept between calls and only
+    repaired for the boxes added or removed since, so replanning after a part is
+    placed costs in proportion to the change. Same result as astar_grid.
+    """
+    key = (tuple(start), tuple(goal), tuple(map(tuple, bounds)), step, radius)
+    with _incremental_lock:
+        planner = _incremental.pop(key, None)
+        expanded = 0
+        if planner is None:
+            try:
+                planner = IncrementalPlanner(start, goal, obstacles, bounds, step=step, radius=radius)
+            except ValueError:
+                return None
+            path = planner.plan()
+        else:
+            expanded = planner.expanded
+            path = planner.sync(obstacles)
+        _incremental[key] = planner
+        while len(_incremental) > INCREMENTAL_ROUTES:
+            _incremental.popitem(last=False)
+        if stats is not None:
+            stats["expansions"] = planner.expanded - expanded
+    return path
+
+def reset_incremental():
+    """Drop the live planners of the "incremental" engine"""
+    with _incremental_lock:
+        _incremental.clear()
+
+def segment_clear_3d(p0: Tuple[float,float,float], p1: Tuple[float,float,float],
+                     obstacles, radius: float = 0.0, clearance: float = 0.0) -> bool:
+    """Check the straight 3D move p0->p1 against boxes inflated by radius (XY) and clearance (Z)"""
+    if isinstance(obstacles, ObstacleIndex):
+        obstacles = obstacles.obstacles
+    if not obstacles:
+        return True
+    b = np.array([obs.key() for obs in obstacles], dtype=float)
+    lo = b[:, :3] - (radius, radius, clearance)
+    hi = b[:, 3:] + (radius, radius, clearance)
+    tmin = np.zeros(len(b))
+    tmax = np.ones(len(b))
+    for axis in range(3):
+        o, d = p0[axis], p1[axis] - p0[axis]
+        if d == 0:
+            tmax = np.where((o < lo[:, axis]) | (o > hi[:, axis]), -1.0, tmax)
+        else:
+            t1, t2 = (lo[:, axis] - o) / d, (hi[:, axis] - o) / d
+            tmin = np.maximum(tmin, np.minimum(t1, t2))
+            tmax = np.minimum(tmax, np.maximum(t1, t2))
+    return not bool(np.any(tmin <= tmax))
+
+def segment_clearance(p0: Tuple[float,float,float], p1: Tuple[float,float,float],
+                      obstacles, radius: float = 0.0) -> float:
+    """
+    Smallest distance from the straight 3D move p0->p1 to any box, less radius
+    (0 when touching, inf without obstacles). Distance to a box is convex along
+    the segment, so a ternary search per box (vectorised over boxes) is exact.
+    """
+    if isinstance(obstacles, ObstacleIndex):
+        obstacles = obstacles.obstacles
+    if not obstacles:
+        return math.inf
+    b = np.array([obs.key() for obs in obstacles], dtype=float)
+    lo, hi = b[:, :3], b[:, 3:]
+    a, d = np.asarray(p0, dtype=float), np.asarray(p1, dtype=float) - np.asarray(p0, dtype=float)
+
+    def dist(t):
+        p = a + t[:, None] * d
+        return np.linalg.norm(np.maximum(np.maximum(lo - p, p - hi), 0.0), axis=1)
+
+    t0, t1 = np.zeros(len(b)), np.ones(len(b))
+    for _ in range(40):
+        m0, m1 = t0 + (t1 - t0) / 3, t1 - (t1 - t0) / 3
+        closer = dist(m0) < dist(m1)
+        t1 = np.where(closer, m1, t1)
+        t0 = np.where(closer, t0, m0)
+    return max(float(dist((t0 + t1) / 2).min()) - radius, 0.0)
+
+# Any-angle post-pass: keep only the waypoints needed for collision-free straight legs
+def smooth_path(path: List[Tuple[float,float]], obstacles, radius: float = 2.0) -> List[Tuple[float,float]]:
+    """
+    Greedy line-of-sight shortcutting: from each kept waypoint jump to the
+    furthest later waypoint it can reach in a straight clear line.
+    """
+    if not path or len(path) < 3:
+        return list(path or [])
+    index = obstacle_index(obstacles, radius)
+    smoothed = [path[0]]
+    i = 0
+    while i < len(path) - 1:
+        j = len(path) - 1
+        while j > i + 1 and index.segment_hits(path[i], path[j]):
+            j -= 1
+        smoothed.append(path[j])
+        i = j
+    return smoothed
+
+# XY planners selectable in plan_path
+PLANNERS = {
+    "astar": astar_2d,
+    "grid": astar_grid,
+    "anytime": astar_anytime,
+    "incremental": astar_incremental,
+}
+
+def _lifted_path(start, goal, z, xy_path, obstacles, radius, smooth):
+    """Rise to z, follow xy_path at z, then descend straight to goal"""
+    sx, sy, _ = start
+    gx, gy, gz = goal
+    path3d = [(sx, sy, z)]
+
+    if smooth:
+        obstacles = obstacle_index(obstacles, radius)
+        xy_path = smooth_path(xy_path, obstacles, radius)
+
+    for (x, y) in xy_path:
+        if smooth and path3d[-1] == (x, y, z):
+            continue
+        path3d.append((x, y, z))
+
+    if path3d[-1] != (gx, gy, gz):
+        path3d.append((gx, gy, gz))
+    return path3d
+
+def _plan_min_lift(start, goal, obstacles, workspace, safe_z, step, radius, search, smooth, clearance):
+    """Lowest travel height below safe_z with an XY path around the obstacles still taller than it"""
+    sx, sy, sz = start
+    gx, gy, gz = goal
+    if isinstance(obstacles, ObstacleIndex):
+        obstacles = obstacles.obstacles
+
+    if segment_clear_3d(start, goal, obstacles, radius, clearance):
+        return [start, goal]
+
+    floor_z = max(sz, gz)
+    heights = sorted({floor_z} | {obs.zmax + clearance for obs in obstacles
+                                  if floor_z < obs.zmax + clearance < safe_z})
+    # free space only grows with height, so binary search the lowest feasible level
+    best = None
+    lo, hi = 0, len(heights) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        z = heights[mid]
+        tall = [obs for obs in obstacles if obs.zmax + clearance > z]
+        xy_path = search((sx, sy), (gx, gy), tall, workspace, step=step, radius=radius)
+        if xy_path is None:
+            lo = mid + 1
+        else:
+            best = (z, tall, xy_path)
+            hi = mid - 1
+    if best is None:
+        return None
+    z, tall, xy_path = best
+    return _lifted_path(start, goal, z, xy_path, tall, radius, smooth)
+
 # Full planner: safeZ -> XY A* -> descend
 def plan_path(start: Tuple[float,float,float],
               goal: Tuple[float,float,float],
-              obstacles: List[AABB],
+              obstacles,
               workspace: Tuple[Tuple[float,float],Tuple[float,float]],
               safe_z: float = 50.0,
               step: float = 5.0,
-              radius: float = 2.0) -> List[Tuple[float,float,float]]:
+              radius: float = 2.0,
+              engine: str = "astar",
+              smooth: bool = False,
+              mode: str = "safe_z",
+              clearance: float = 5.0,
+              max_time: float = None) -> List[Tuple[float,float,float]]:
     """
     Returns a list of (x,y,z) waypoints for LitePlacer end effector
+    engine: key of PLANNERS used for the XY search
+    smooth: shortcut the lattice path to the fewest clear straight legs
+    mode: "safe_z" always travels at safe_z; "3d" moves straight when clear,
+          otherwise lifts only clearance above the obstacle tops in the way,
+          falling back to safe_z
+    max_time: wall-clock budget (s) per XY search for engines that take one ("anytime")
     """
-    sx, sy, sz = start
-    gx, gy, gz = goal
+    if engine not in PLANNERS:
+        raise ValueError(f"Unknown planner engine: {engine}")
+    if mode not in ("safe_z", "3d"):
+        raise ValueError(f"Unknown planner mode: {mode}")
 
-    # 1. Move straight up to safe_z
-    path3d = [(sx, sy, safe_z)]
+    search = PLANNERS[engine] if max_time is None else partial(PLANNERS[engine], max_time=max_time)
+    if mode == "3d":
+        path3d = _plan_min_lift(start, goal, obstacles, workspace, safe_z, step, radius,
+                                search, smooth, clearance)
+        if path3d is not None:
+            return path3d
 
-    # 2. Plan XY path at safe_z
-    xy_path = astar_2d((sx, sy), (gx, gy), obstacles, workspace, step=step, radius=radius)
+    # Move up to safe_z, plan XY at safe_z, descend to goal
+    xy_path = search(start[:2], goal[:2], obstacles, workspace, step=step, radius=radius)
     if xy_path is None:
         raise RuntimeError("No XY path found!")
 
-    for (x, y) in xy_path:
-        path3d.append((x, y, safe_z))
+    return _lifted_path(start, goal, safe_z, xy_path, obstacles, radius, smooth)
 
-    # 3. Descend straight to goal
-    path3d.append((gx, gy, gz))
+# Batch planning: one long-lived pool of spawned workers (forking a multi-threaded server
+# is unsafe) serves every request; each task carries its obstacle set and workers keep
+# the indexes of the last few sets they planned in
+INLINE_PAIRS = 8        # smaller batches are planned in the calling thread
+WORKER_INDEXES = 4
+_worker_indexes = OrderedDict()
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
 
-    return path3d
+def _obstacle_index(boxes, radius) -> ObstacleIndex:
+    key = (boxes, radius)
+    index = _worker_indexes.get(key)
+    if index is None:
+        index = _worker_indexes[key] = ObstacleIndex([AABB(*box) for box in boxes], radius=radius)
+        while len(_worker_indexes) > WORKER_INDEXES:
+            _worker_indexes.popitem(last=False)
+    return index
+
+def _plan_one(index, item):
+    key, start, goal, workspace, params = item
+    try:
+        return key, plan_path(start, goal, index, workspace, **params)
+    except RuntimeError:
+        return key, None
+
+def _plan_worker(item):
+    boxes, radius, item = item
+    return _plan_one(_obstacle_index(boxes, radius), item)
+
+def _plan_pool(workers: int, reset: bool = False) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if reset or _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+def plan_many(pairs, obstacles, workspace, max_workers: int = None, **params):
+    """
+    Plan {key: (start, goal)} pairs, in the shared worker pool from INLINE_PAIRS pairs
+    on when there is more than one worker.
+    Returns {key: path}, with None for pairs that have no path.
+    """
+    if isinstance(obstacles, ObstacleIndex):
+        obstacles = obstacles.obstacles
+    boxes = tuple(obs.key() for obs in obstacles)
+    radius = params.get("radius", 2.0)
+    items = [(key, start, goal, workspace, params) for key, (start, goal) in pairs.items()]
+
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(items) < INLINE_PAIRS:
+        index = ObstacleIndex(list(obstacles), radius=radius)
+        return dict(_plan_one(index, item) for item in items)
+
+    chunksize = max(1, len(items) // (4 * workers))
+    tasks = [(boxes, radius, item) for item in items]
+    try:
+        return dict(_plan_pool(workers).map(_plan_worker, tasks, chunksize=chunksize))
+    except BrokenProcessPool:
+        logging.warning("plan_many: worker pool died, starting a new one")
+        return dict(_plan_pool(workers, reset=True).map(_plan_worker, tasks, chunksize=chunksize))
+
+# LRU memo of plan_path results for repeated routes in an unchanged workspace
+class PlanCache:
+    def __init__(self, maxsize: int = 1024, quantum: float = 0.01):
+        """
+        quantum: grid (mm) start/goal are snapped to when building keys
+        Call sync() with a workspace fingerprint before lookups; any change clears the cache.
+        Safe to share between threads.
+        """
+        self.maxsize = maxsize
+        self.quantum = quantum
+        self.workspace = None
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._plans)
+
+    def key(self, start, goal, **params):
+        q = self.quantum
+        snap = lambda p: tuple(int(round(v / q)) for v in p)
+        return (snap(start), snap(goal), tuple(sorted(params.items())))
+
+    def sync(self, workspace) -> bool:
+        """Clear cached plans if the workspace fingerprint changed; returns True if cleared"""
+        with self._lock:
+            if workspace == self.workspace:
+                return False
+            self._plans.clear()
+            self.workspace = workspace
+            return True
+
+    def get(self, key):
+        with self._lock:
+            path = self._plans.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return list(path)
+
+    def put(self, key, path, workspace=None):
+        """Store path; with workspace, only if the cache still belongs to that fingerprint"""
+        with self._lock:
+            if workspace is not None and workspace != self.workspace:
+                return
+            self._plans[key] = tuple(path)
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.workspace = None
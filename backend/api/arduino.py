@@ -1,6 +1,7 @@
 # backend/machines/tool_changer.py
 # import serial
 import time
+import asyncio
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
 
@@ -16,9 +17,11 @@ class ConnectRequest(BaseModel):
     timeout: float = 3.0  # seconds
 
 @router.post("/connect")
-def connect(req: ConnectRequest, request: Request):
+async def connect(req: ConnectRequest, request: Request):
     arduino = request.app.state.factory.machines['arduino']
-    return arduino.connect(req.method, req.ip, req.port, req.com, req.baud)
+    result = await asyncio.to_thread(arduino.connect, req.method, req.ip, req.port, req.com, req.baud)
+    await arduino.open_async()
+    return result
 
 def send_cmd(cmd: str):
     if arduino is None or not arduino.is_open:
@@ -45,22 +48,22 @@ class Screw(BaseModel):
     speed: int
 
 @router.post("/screw_clockwise")
-def screw_clockwise(req: Screw, request: Request):
+async def screw_clockwise(req: Screw, request: Request):
     arduino = request.app.state.factory.machines['arduino']
-    lines = arduino.screw("FWD", req.duration, req.speed)
+    lines = await arduino.ascrew("FWD", req.duration, req.speed)
     return {"status": "completed", "response": lines}
 
 
 @router.post("/screw_reverse")
-def screw_reverse(req: Screw, request: Request):
+async def screw_reverse(req: Screw, request: Request):
     arduino = request.app.state.factory.machines['arduino']
     # lines = arduino.screw("CCW", req.duration, req.speed)
-    lines = arduino.screw("BKW", req.duration, req.speed)
+    lines = await arduino.ascrew("BKW", req.duration, req.speed)
     return {"status": "completed", "response": lines}
 
 
 @router.post("/screwdriver_stop")
-def screwdriver_stop(request: Request):
+async def screwdriver_stop(request: Request):
     arduino = request.app.state.factory.machines['arduino']
-    lines = arduino.screw("STOP")
+    lines = await arduino.ascrew("STOP")
     return {"status": "completed", "response": lines}
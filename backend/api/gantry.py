@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
 import asyncio
-from typing import List
+from typing import List, Optional
 import logging
+from aabb import PlanningBudgetExceeded
 
 
 router = APIRouter(tags=["gantry"])
@@ -18,6 +19,9 @@ class ConnectRequest(BaseModel):
     ip: str = '10.163.187.60'
     port: int = 8000
     timeout: float = 3.0  # seconds
+    # switch the TinyG to JSON mode with filtered status reports pushed while moving
+    # (other tools on the port then get JSON too); off: get_info polls "?"
+    status_reports: bool = False
 
 class SetPositionRequest(BaseModel):
     x: float
@@ -39,6 +43,24 @@ class RawCommandRequest(BaseModel):
     command: str
     delay: float = 0.05
 
+class Waypoint(BaseModel):
+    x: float
+    y: float
+    z: float
+    a: float = 0.0
+    speed: float = 2000  # mm/min
+
+class TrajectoryRequest(BaseModel):
+    waypoints: List[Waypoint]
+    check_collisions: bool = True
+    optimize_feed: bool = False  # replace speeds with the per-segment feedrate plan
+    tolerance: Optional[float] = None  # mm; round corners into G2/G3 arcs
+
+class PlotPathRequest(BaseModel):
+    x: float
+    y: float
+    z: float = 0.0
+
 class DetachRequest(BaseModel):
     target: str
 
@@ -59,6 +81,13 @@ async def connect(req: ConnectRequest, request: Request):
         await asyncio.to_thread(
             gantry.connect, req.method, req.ip, req.port, req.com, req.baud
         )
+        # serve replies from the event loop instead of worker threads
+        await gantry.open_async()
+        if req.status_reports:
+            try:
+                await gantry.aenable_status_reports()
+            except TimeoutError:
+                logging.warning("Gantry status reports not enabled, get_info will poll")
         return {"status": "connected", "device": "gantry"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -71,7 +100,7 @@ async def get_info(request: Request):
         return {"connected": False}
 
     try:
-        info = await asyncio.to_thread(gantry.get_info)
+        info = await gantry.aget_info()
         return {"connected": True, **info}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -83,7 +112,7 @@ async def set_position(req: SetPositionRequest, request: Request):
     if not gantry:
         raise HTTPException(400, "Gantry not connected")
 
-    await asyncio.to_thread(gantry.set_position, req.x, req.y, req.z, req.a)
+    await gantry.aset_position(req.x, req.y, req.z, req.a)
     return {"status": "ok"}
 
 
@@ -93,10 +122,8 @@ async def goto(req: MoveXYZRequest, request: Request):
     if not gantry:
         raise HTTPException(400, "Gantry not connected")
 
-    # Step movement in background thread
-    await asyncio.to_thread(
-        gantry.goto, req.x, req.y, req.z, req.a, req.speed
-    )
+    # returns once the move is queued on the controller
+    await gantry.agoto(req.x, req.y, req.z, req.a, req.speed)
 
     return {"status": "ok", "target": req.dict()}
 
@@ -107,19 +134,37 @@ async def step(req: MoveXYZRequest, request: Request):
     if not gantry:
         raise HTTPException(400, "Gantry not connected")
 
-    await asyncio.to_thread(
-        gantry.step, req.x, req.y, req.z, req.a, req.speed
-    )
+    await gantry.astep(req.x, req.y, req.z, req.a, req.speed)
     return {"status": "ok", "delta": req.dict()}
 
 
+@router.post("/jog")
+async def jog(req: MoveXYZRequest, request: Request):
+    """Relative jog step, merged with other pending steps into as few moves as possible"""
+    gantry = request.app.state.factory.machines['gantry']
+    if not gantry or not gantry.is_connected():
+        raise HTTPException(400, "Gantry not connected")
+    pending = gantry.jogger.jog(req.x, req.y, req.z, req.a, req.speed)
+    return {"status": "ok", "pending": pending}
+
+
+@router.post("/jog/cancel")
+async def jog_cancel(request: Request):
+    """Feed hold now and drop queued and pending jog moves"""
+    gantry = request.app.state.factory.machines['gantry']
+    if not gantry or not gantry.is_connected():
+        raise HTTPException(400, "Gantry not connected")
+    await gantry.jogger.cancel()
+    return {"status": "ok", **gantry.jogger.stats}
+
+
 @router.post("/unlock")
 async def unlock(req: UnlockRequest, request: Request):
     gantry = request.app.state.factory.machines['gantry']
     if not gantry:
         raise HTTPException(400, "Gantry not connected")
 
-    await asyncio.to_thread(gantry.unlock, req.time_s)
+    await gantry.aunlock(req.time_s)
     return {"status": "completed"}
 
 
@@ -151,6 +196,7 @@ async def edit_locations(req: EditLocationsRequest, request: Request):
     # Update the gantry's locations safely in a thread
     async def update_locations():
         gantry.locations = [loc.dict() for loc in req.locations]
+        request.app.state.factory.workspace_changed()
         await asyncio.to_thread(lambda: None)  # placeholder if gantry needs real sync save
 
     await update_locations()
@@ -176,3 +222,94 @@ async def attach(req: AttachRequest, request: Request):
 
     await asyncio.to_thread(gantry.attach, req.target)
     return {"status": "completed"}
+
+
+def _trajectory_points(gantry, waypoints):
+    """(x, y, z, a) from the current toolend position through the waypoints"""
+    position = gantry.toolend['position']
+    points = [(position['x'], position['y'], position['z'], position['a'])]
+    return points + [(wp.x, wp.y, wp.z, wp.a) for wp in waypoints]
+
+
+@router.post("/plot_path")
+async def plot_path(req: PlotPathRequest, request: Request):
+    """Path around the parts from the toolend to a target ("go to part"), in bounded time"""
+    factory = request.app.state.factory
+    gantry = factory.machines['gantry']
+    if not gantry.workspace:
+        raise HTTPException(400, "plot_path needs the gantry workspace")
+    position = gantry.toolend['position']
+    machine = {'bounds': gantry.workspace[:2], 'location': (position['x'], position['y'], position['z'])}
+    try:
+        path = await asyncio.to_thread(factory.plot_path, machine, {'location': (req.x, req.y, req.z)})
+    except PlanningBudgetExceeded as e:
+        raise HTTPException(504, str(e))
+    except RuntimeError as e:
+        raise HTTPException(422, str(e))
+    return {"status": "ok", "path": path}
+
+
+@router.post("/trajectory")
+async def trajectory(req: TrajectoryRequest, request: Request):
+    """Validate and queue a whole list of waypoints, in order, as one motion program"""
+    factory = request.app.state.factory
+    gantry = factory.machines['gantry']
+    if not gantry or not gantry.is_connected():
+        raise HTTPException(400, "Gantry not connected")
+    if not req.waypoints:
+        raise HTTPException(400, "No waypoints")
+    running = gantry.trajectory_progress()
+    if running and running["state"] == "queueing":
+        raise HTTPException(409, "A trajectory is still being queued")
+
+    waypoints = [wp.dict() for wp in req.waypoints]
+    errors = factory.validate_trajectory(waypoints, req.check_collisions)
+    if errors:
+        raise HTTPException(422, {"errors": errors})
+    if req.optimize_feed:
+        for wp, feed in zip(waypoints, factory.plan_feedrates(_trajectory_points(gantry, req.waypoints))):
+            wp['speed'] = feed
+
+    try:
+        if req.tolerance:
+            points = _trajectory_points(gantry, req.waypoints)
+            lines = factory.compile_path(points, [wp['speed'] for wp in waypoints], req.tolerance)
+            progress = await gantry.arun_program(lines)
+        else:
+            progress = await gantry.arun_trajectory(waypoints)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "queued", **progress}
+
+
+@router.get("/trajectory")
+async def trajectory_progress(request: Request):
+    gantry = request.app.state.factory.machines['gantry']
+    progress = gantry.trajectory_progress()
+    if progress is None:
+        return {"state": "idle"}
+    return progress
+
+
+@router.post("/estimate")
+async def estimate(req: TrajectoryRequest, request: Request, profile: str = "scurve"):
+    """Predicted time to run the waypoints from the current toolend position"""
+    factory = request.app.state.factory
+    points = _trajectory_points(factory.machines['gantry'], req.waypoints)
+    speeds = factory.plan_feedrates(points) if req.optimize_feed else [wp.speed for wp in req.waypoints]
+    try:
+        result = factory.estimate_path(points, speeds, profile)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "ok", **result}
+
+
+@router.post("/compile")
+async def compile_trajectory(req: TrajectoryRequest, request: Request):
+    """G-code the trajectory would be sent as, with corners rounded within req.tolerance"""
+    factory = request.app.state.factory
+    gantry = factory.machines['gantry']
+    points = _trajectory_points(gantry, req.waypoints)
+    speeds = factory.plan_feedrates(points) if req.optimize_feed else [wp.speed for wp in req.waypoints]
+    lines = factory.compile_path(points, speeds, req.tolerance or 0.0)
+    return {"status": "ok", "lines": lines, "waypoints": len(req.waypoints)}
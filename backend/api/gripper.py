@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Request
 from pydantic import BaseModel
 router = APIRouter(tags=["gripper"])
@@ -22,9 +23,9 @@ class SetSpeed(BaseModel):
 
 
 @router.post("/connect")
-def connect(req: ConnectRequest, request: Request):
+async def connect(req: ConnectRequest, request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    connected = gripper.connect(req.method, req.ip, req.port, req.com, req.baud)
+    connected = await asyncio.to_thread(gripper.connect, req.method, req.ip, req.port, req.com, req.baud)
     return {
         "connected": connected,
         "status": gripper.status
@@ -32,37 +33,37 @@ def connect(req: ConnectRequest, request: Request):
 
 
 @router.post("/gripper_open")
-def gripper_open(cmd: GripperCommand, request: Request):
+async def gripper_open(cmd: GripperCommand, request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    return gripper.open(cmd.time_s, cmd.speed)
+    return await gripper.aopen(cmd.time_s, cmd.speed)
 
 
 @router.post("/gripper_close")
-def gripper_close(cmd: GripperCommand, request: Request):
+async def gripper_close(cmd: GripperCommand, request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    return gripper.close(cmd.time_s, cmd.speed)
+    return await gripper.aclose(cmd.time_s, cmd.speed)
 
 
 @router.post("/speed_up")
-def speed_up(request: Request):
+async def speed_up(request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    return gripper.speed_up()
+    return await gripper.aspeed_up()
 
 
 @router.post("/speed_down")
-def speed_down(request: Request):
+async def speed_down(request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    return gripper.speed_down()
+    return await gripper.aspeed_down()
 
 
 @router.post("/set_speed")
-def set_speed(cmd: SetSpeed, request: Request):
+async def set_speed(cmd: SetSpeed, request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    gripper.set_speed(cmd.speed)
+    await gripper.aset_speed(cmd.speed)
     return {"ok": True}
 
 
 @router.get("/get_status")
-def get_status(request: Request):
+async def get_status(request: Request):
     gripper = request.app.state.factory.machines['gripper']
-    return gripper.get_status() if gripper else {}
+    return await gripper.aget_status() if gripper else {}
@@ -1,8 +1,9 @@
 import logging
 import asyncio
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, HTTPException
 from fastapi import FastAPI
 from pydantic import BaseModel
+from simulation import factory_sim
 router = APIRouter(tags=["jobs"])
 
 logging.basicConfig(level=logging.INFO)
@@ -54,3 +55,65 @@ async def run_script(path: str, request: Request):
     # Run job in thread to avoid blocking FastAPI
     await asyncio.to_thread(request.app.state.factory.run_script, path)
     return {"status": "ok"}
+
+
+@router.get("/compile_program")
+async def compile_program(request: Request, force: bool = False):
+    """Compile the jobs into a G-code program file (cached next to the jobs file)"""
+    try:
+        path = await asyncio.to_thread(request.app.state.factory.compile_program, force)
+    except RuntimeError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "ok", "program": path}
+
+
+@router.post("/run_program")
+async def run_program(request: Request):
+    """Run all jobs from the compiled program"""
+    factory = request.app.state.factory
+    if not factory.machines['gantry'].is_connected():
+        raise HTTPException(400, "Gantry not connected")
+    try:
+        result = await asyncio.to_thread(factory.run_program)
+    except (RuntimeError, TimeoutError) as e:
+        raise HTTPException(500, str(e))
+    return {"status": "ok", **result}
+
+
+@router.get("/optimize_jobs")
+async def optimize_jobs(request: Request):
+    """Proposed job order grouped by effector, with estimated time before/after"""
+    result = await asyncio.to_thread(request.app.state.factory.optimize_jobs)
+    return {"status": "ok", **result}
+
+
+@router.post("/optimize_jobs")
+async def apply_optimized_jobs(request: Request):
+    """Rewrite the jobs list in the proposed order"""
+    result = await asyncio.to_thread(request.app.state.factory.optimize_jobs, True)
+    return {"status": "ok", **result}
+
+
+@router.get("/estimate")
+async def estimate(request: Request, profile: str = "scurve", planned: bool = False,
+                   optimize_feed: bool = False):
+    """Predicted time per job and in total, from the gantry kinematic limits"""
+    try:
+        result = await asyncio.to_thread(request.app.state.factory.estimate_jobs, profile, planned,
+                                         optimize_feed)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "ok", **result}
+
+
+@router.get("/simulate")
+async def simulate(request: Request, cycles: int = 1, profile: str = "scurve", trace: bool = False):
+    """Discrete-event run of the job list: makespan, cycles per hour and machine utilization"""
+    if cycles < 1:
+        raise HTTPException(400, "cycles must be at least 1")
+    try:
+        result = await asyncio.to_thread(factory_sim.simulate, request.app.state.factory, cycles, profile,
+                                         None, trace)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"status": "ok", **result}
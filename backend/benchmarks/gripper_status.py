@@ -0,0 +1,159 @@
+"""
+Gripper status parser benchmark: single-pass parse_status against the previous
+find-per-key parser (kept below as legacy_parse_status).
+
+Run from backend/:
+    python -m benchmarks.gripper_status --out bench_gripper_status.json
+    python -m benchmarks.gripper_status --repeat 50000 --batch 1000
+
+Measured: time per status page for a full page, a page with missing keys and
+a padded page, and for batches through parse_statuses. Field values of both
+parsers are compared; the legacy parser read "mode" from inside "Device Mode:".
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from machines.gripper import parse_status, parse_statuses
+
+SAMPLES = {
+    "full": "Active ID:1<p>Position:2047<p>Device Mode:0<p>Voltage:12.1<p>Load:0<p>Speed:0<p>"
+            "Temper:29<p>Speed Set:100<p>ID to Set:1<p>Mode:Servo<p>Torque:On",
+    "partial": "Active ID:1<p>Position:2047<p>Voltage:12.1<p>Temper:29",
+    "padded": "<html><body>" + "Active ID: 1 <p> Position: 2047 <p> Voltage: 12.1 <p> Load: 0 <p>"
+              " Speed: 0 <p> Temper: 29 <p> Speed Set: 100 <p> ID to Set: 1 <p> Mode: Motor"
+              + " " * 200 + "</body></html>",
+}
+
+
+def legacy_parse_status(raw: str):
+    if not raw:
+        return {}
+
+    keys = [
+        "Active ID:",
+        "Position:",
+        "Device Mode:",
+        "Voltage:",
+        "Load:",
+        "Speed:",
+        "Temper:",
+        "Speed Set:",
+        "ID to Set:",
+        "Mode:",
+        "Torque"
+    ]
+    numeric_keys = ["Position", "Voltage", "Load", "Speed", "Temper", "Speed Set"]
+
+    status = {}
+    text = raw.replace("<p>", " ")
+
+    for key in keys:
+        if key not in text:
+            continue
+
+        start = text.find(key) + len(key)
+        end = len(text)
+
+        for next_key in keys:
+            if next_key == key:
+                continue
+            idx = text.find(next_key, start)
+            if idx != -1:
+                end = min(end, idx)
+
+        value = text[start:end].strip()
+        clean_key = key.replace(":", "").replace(" ", "_").lower()
+
+        try:
+            status[clean_key] = float(value) if key.replace(":", "") in numeric_keys else value
+        except Exception:
+            status[clean_key] = value
+
+    return status
+
+
+def _per_call_us(fn, arg, repeat, rounds=5):
+    """Best of rounds, microseconds per call"""
+    best = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn(arg)
+        best.append((time.perf_counter() - t0) / repeat * 1e6)
+    return round(min(best), 3), round(statistics.median(best), 3)
+
+
+def _differences(raw):
+    old, new = legacy_parse_status(raw), parse_status(raw)
+    return {key: [old.get(key), new.get(key)] for key in sorted(set(old) | set(new)) if old.get(key) != new.get(key)}
+
+
+def bench_single(repeat):
+    results = {}
+    for name, raw in SAMPLES.items():
+        legacy_best, legacy_median = _per_call_us(legacy_parse_status, raw, repeat)
+        best, median = _per_call_us(parse_status, raw, repeat)
+        results[name] = {
+            "legacy_us": legacy_best,
+            "legacy_median_us": legacy_median,
+            "single_pass_us": best,
+            "single_pass_median_us": median,
+            "speedup": round(legacy_best / best, 2),
+            "differences": _differences(raw),
+        }
+    return results
+
+
+def bench_batch(batch, repeat):
+    rng = random.Random(0)
+    raws = [rng.choice(list(SAMPLES.values())) for _ in range(batch)]
+    rounds = max(repeat // batch, 1)
+    legacy_best, _ = _per_call_us(lambda items: [legacy_parse_status(raw) for raw in items], raws, rounds)
+    best, _ = _per_call_us(parse_statuses, raws, rounds)
+    return {
+        "batch": batch,
+        "legacy_us_per_page": round(legacy_best / batch, 3),
+        "single_pass_us_per_page": round(best / batch, 3),
+        "speedup": round(legacy_best / best, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000, help="parses per timing round")
+    parser.add_argument("--batch", type=int, default=500, help="status pages per parse_statuses call")
+    parser.add_argument("--out", help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    single = bench_single(args.repeat)
+    print("speedup: " + ", ".join(f"{k}={v['speedup']}x" for k, v in single.items()), file=sys.stderr)
+    batch = bench_batch(args.batch, args.repeat)
+    print(f"batch of {batch['batch']}: {batch['speedup']}x", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "single": single,
+        "batch": batch,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Planner benchmark on synthetic factories (no hardware needed).
+
+Run from backend/:
+    python -m benchmarks.planners --out bench_planners.json
+    python -m benchmarks.planners --obstacles 10 100 --steps 10 5 --repeat 3
+
+Each workspace holds N random AABB parts at constant density, with start and
+goal in opposite corners. Every PLANNERS engine is timed at every step and
+the time, expansions, peak memory and path length are written as JSON.
+Replan cases then move one part at a time (--replans) and compare planning
+from scratch ("grid") with repairing the live plan ("incremental").
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from aabb import AABB, PLANNERS, ObstacleIndex, PlanningBudgetExceeded, reset_incremental
+
+AREA_PER_OBSTACLE = 50.0 * 50.0  # mm^2, keeps density fixed as N grows
+MARGIN = 20.0                    # obstacle-free corner around start and goal
+
+
+def make_workspace(n: int, seed: int):
+    """n random parts in a square bench sized for constant density"""
+    rng = random.Random(seed)
+    side = math.sqrt(n * AREA_PER_OBSTACLE)
+    start, goal = (1.0, 1.0), (side - 1.0, side - 1.0)
+    obstacles = []
+    while len(obstacles) < n:
+        w, h = rng.uniform(5, 25), rng.uniform(5, 25)
+        x, y = rng.uniform(0, side - w), rng.uniform(0, side - h)
+        if (x < MARGIN and y < MARGIN) or (x + w > side - MARGIN and y + h > side - MARGIN):
+            continue
+        obstacles.append(AABB(x, y, 0, x + w, y + h, rng.uniform(5, 40)))
+    return obstacles, ((0.0, side), (0.0, side)), start, goal
+
+
+def run_case(engine: str, obstacles, bounds, start, goal, step: float, radius: float, repeat: int):
+    planner = PLANNERS[engine]
+    index = ObstacleIndex(obstacles, radius=radius)
+
+    def plan(stats):
+        reset_incremental()  # time a first plan, not a lookup of the live one
+        try:
+            return planner(start, goal, index, bounds, step=step, radius=radius, stats=stats), None
+        except PlanningBudgetExceeded as e:
+            return None, str(e)
+
+    best = math.inf
+    for _ in range(repeat):
+        stats = {}
+        t0 = time.perf_counter()
+        path, error = plan(stats)
+        best = min(best, time.perf_counter() - t0)
+
+    # memory in a separate run: tracemalloc slows allocation-heavy code a lot
+    tracemalloc.start()
+    plan({})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "time_s": round(best, 6),
+        "expansions": stats.get("expansions"),
+        "peak_kb": round(peak / 1024, 1),
+        "found": path is not None,
+        "waypoints": len(path) if path else 0,
+        "length_mm": round(sum(math.dist(a, b) for a, b in zip(path, path[1:])), 3) if path else None,
+        "error": error,
+    }
+
+
+def run_replans(obstacles, bounds, start, goal, step: float, radius: float, replans: int, seed: int):
+    """Mean time and expansions per replan after moving one random part, per engine"""
+    rng = random.Random(seed)
+    obstacles = list(obstacles)
+    moved = []
+    for _ in range(replans):
+        i = rng.randrange(len(obstacles))
+        o = obstacles[i]
+        dx, dy = rng.uniform(-10, 10), rng.uniform(-10, 10)
+        obstacles[i] = AABB(o.xmin + dx, o.ymin + dy, o.zmin, o.xmax + dx, o.ymax + dy, o.zmax)
+        moved.append(list(obstacles))
+
+    results = {}
+    for engine in ("grid", "incremental"):
+        reset_incremental()
+        PLANNERS[engine](start, goal, obstacles, bounds, step=step, radius=radius)
+        elapsed, expansions = 0.0, 0
+        for workspace in moved:
+            stats = {}
+            t0 = time.perf_counter()
+            PLANNERS[engine](start, goal, workspace, bounds, step=step, radius=radius, stats=stats)
+            elapsed += time.perf_counter() - t0
+            expansions += stats.get("expansions") or 0
+        results[engine] = {"time_s": round(elapsed / replans, 6), "expansions": expansions // replans}
+    reset_incremental()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--obstacles", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--steps", type=float, nargs="+", default=[10.0, 5.0, 2.0])
+    parser.add_argument("--engines", nargs="+", default=list(PLANNERS), choices=list(PLANNERS))
+    parser.add_argument("--radius", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replans", type=int, default=5, help="one-part moves per replan case (0 to skip)")
+    parser.add_argument("--max-cells", type=int, default=250_000,
+                        help="skip workspace/step combinations with more lattice points than this")
+    parser.add_argument("--out", help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.obstacles:
+        obstacles, bounds, start, goal = make_workspace(n, args.seed)
+        side = bounds[0][1]
+        for step in args.steps:
+            cells = int((side / step + 1) ** 2)
+            for engine in args.engines:
+                case = {"obstacles": n, "step": step, "engine": engine, "cells": cells}
+                if cells > args.max_cells:
+                    results.append({**case, "skipped": "max_cells"})
+                    continue
+                case.update(run_case(engine, obstacles, bounds, start, goal, step, args.radius, args.repeat))
+                results.append(case)
+                print(f"{engine:>8} n={n:<6} step={step:<5g} {case['time_s']:.4f}s "
+                      f"exp={case['expansions']} found={case['found']}", file=sys.stderr)
+            if args.replans and cells <= args.max_cells:
+                replans = run_replans(obstacles, bounds, start, goal, step, args.radius, args.replans, args.seed)
+                for engine, result in replans.items():
+                    results.append({"obstacles": n, "step": step, "engine": engine, "cells": cells,
+                                    "case": "replan", **result})
+                    print(f"{engine:>8} n={n:<6} step={step:<5g} replan {result['time_s']:.4f}s "
+                          f"exp={result['expansions']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "seed": args.seed,
+            "radius": args.radius,
+            "repeat": args.repeat,
+            "replans": args.replans,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+End-to-end serial path benchmark against the virtual TinyG (no hardware needed).
+
+Run from backend/ (Linux/macOS):
+    python -m benchmarks.serial_path --out bench_serial.json
+    python -m benchmarks.serial_path --lines 2000 --time-scale 1000
+
+A Gantry connects to a simulation.virtual_tinyg pty exactly as to a COM port.
+Measured: command round-trip latency on the blocking, streamer and asyncio
+paths, and G-code streaming throughput through the flow-controlled streamer.
+With a large --time-scale motion is nearly free, so throughput is bounded by
+the serial path itself.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from machines.gantry import Gantry
+from simulation.virtual_tinyg import VirtualTinyG
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _connect(vt):
+    gantry = Gantry()
+    gantry.toolend = {"position": {"x": 0, "y": 0, "z": 0, "a": 0}, "effector": ""}
+    gantry.connect("serial", "", 0, vt.port, 115200, timeout=0.1)
+    return gantry
+
+
+def bench_latency(vt, repeat):
+    gantry = _connect(vt)
+    results = {"blocking": _summary(_timed(lambda: gantry.send("?"), repeat))}
+
+    gantry.start_streaming()
+    results["streamer"] = _summary(_timed(lambda: gantry.send("?"), repeat))
+    gantry.stop_streaming()
+
+    async def run():
+        await gantry.open_async()
+        samples = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            await gantry.asend("?")
+            samples.append(time.perf_counter() - t0)
+        gantry.close_async()
+        return samples
+
+    results["asyncio"] = _summary(asyncio.run(run()))
+    gantry.connection.serial.close()
+    return results
+
+
+def bench_stream(vt, lines, step):
+    gantry = _connect(vt)
+    gantry.start_streaming()
+    program = ["G91"] + [f"G1 X{step} F6000"] * lines
+    acked = []
+    t0 = time.perf_counter()
+    gantry.stream(program, timeout=60, on_progress=lambda i, cmd: acked.append(time.perf_counter()))
+    queued_s = time.perf_counter() - t0
+    gantry.wait_motion_complete(timeout=600)
+    done_s = time.perf_counter() - t0
+    gaps = [b - a for a, b in zip(acked, acked[1:])]
+    gantry.stop_streaming()
+    gantry.connection.serial.close()
+    return {
+        "lines": lines,
+        "queued_s": round(queued_s, 4),
+        "done_s": round(done_s, 4),
+        "lines_per_s": round(lines / queued_s, 1),
+        "ack_gap": _summary(gaps) if gaps else None,
+        "simulated_moves": vt.stats["moves"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--step", type=float, default=0.5, help="mm per streamed G1")
+    parser.add_argument("--repeat", type=int, default=50, help="latency samples per path")
+    parser.add_argument("--time-scale", type=float, default=100.0)
+    parser.add_argument("--out", help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    with VirtualTinyG(time_scale=args.time_scale) as vt:
+        latency = bench_latency(vt, args.repeat)
+        print(f"latency p50 ms: " + ", ".join(f"{k}={v['p50_ms']}" for k, v in latency.items()), file=sys.stderr)
+        stream = bench_stream(vt, args.lines, args.step)
+        print(f"stream: {stream['lines_per_s']} lines/s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "time_scale": args.time_scale,
+        },
+        "latency": latency,
+        "stream": stream,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import asyncio
+import io
+import logging
+import threading
+from typing import Callable, List, Optional
+
+
+class AsyncSerial:
+    """
+    Line-based asyncio wrapper around an open pyserial port.
+
+    Incoming bytes are read by an event-loop reader on the port's file
+    descriptor, so awaiting a response does not hold a worker thread. Where
+    the loop cannot watch the fd (e.g. Windows' proactor loop) one reader
+    thread per port feeds the loop instead.
+    Lines that arrive while no command is waiting go to on_unsolicited, as do
+    lines accepted by is_report (asynchronous reports) even mid-command.
+    """
+
+    # reader thread's read timeout (s): close() waits for the thread, not for the port's timeout
+    POLL = 0.1
+
+    def __init__(self, serial_port, on_unsolicited: Callable[[str], None] = None,
+                 is_report: Callable[[str], bool] = None):
+        self.serial = serial_port
+        self.on_unsolicited = on_unsolicited
+        self.is_report = is_report
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lines: Optional[asyncio.Queue] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._buf = b""
+        self._busy = False
+        self._fd = None
+        self._thread = None
+        self._running = False
+
+    async def open(self) -> "AsyncSerial":
+        self.loop = asyncio.get_running_loop()
+        self._lines = asyncio.Queue()
+        self._lock = asyncio.Lock()
+        self._running = True
+        try:
+            fd = self.serial.fileno()
+            self.loop.add_reader(fd, self._on_readable)
+            self._fd = fd
+        except (AttributeError, NotImplementedError, OSError, io.UnsupportedOperation):
+            self._thread = threading.Thread(target=self._read_thread, name="aio-serial-reader", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._running = False
+        if self._fd is not None and self.loop is not None and not self.loop.is_closed():
+            try:
+                in_loop = asyncio.get_running_loop() is self.loop
+            except RuntimeError:
+                in_loop = False
+            if in_loop:
+                self.loop.remove_reader(self._fd)
+            else:
+                self.loop.call_soon_threadsafe(self.loop.remove_reader, self._fd)
+        self._fd = None
+        if self._thread is not None and self._thread is not threading.current_thread():
+            # the next owner of the port (e.g. the streamer) must not lose a reply to a
+            # readline still in flight here: wake it and wait until the thread has exited
+            cancel_read = getattr(self.serial, "cancel_read", None)
+            if cancel_read is not None:
+                try:
+                    cancel_read()
+                except Exception:
+                    pass
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._running
+
+    # ------------------------------------------------------------------
+    # reading
+    # ------------------------------------------------------------------
+    def _on_readable(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except Exception as e:
+            logging.error(f"Serial read failed: {e}")
+            self.close()
+            return
+        self._feed(data)
+
+    def _read_thread(self):
+        timeout = self.serial.timeout
+        self.serial.timeout = self.POLL
+        try:
+            while self._running:
+                try:
+                    data = self.serial.readline()
+                except Exception as e:
+                    logging.error(f"Serial read failed: {e}")
+                    self._running = False
+                    break
+                if data:
+                    self.loop.call_soon_threadsafe(self._feed, data)
+        finally:
+            self.serial.timeout = timeout
+
+    def _feed(self, data: bytes):
+        self._buf += data
+        while b"\n" in self._buf:
+            raw, self._buf = self._buf.split(b"\n", 1)
+            line = raw.decode(errors="ignore").strip()
+            if not line:
+                continue
+            report = self.is_report is not None and self.is_report(line)
+            if self._busy and not report:
+                self._lines.put_nowait(line)
+            elif self.on_unsolicited is not None:
+                try:
+                    self.on_unsolicited(line)
+                except Exception as e:
+                    logging.error(f"Serial report handler failed: {e}")
+
+    # ------------------------------------------------------------------
+    # writing
+    # ------------------------------------------------------------------
+    def write(self, data: str):
+        """Write without waiting for a reply (realtime characters, fire-and-forget commands)"""
+        self.serial.write(data.encode())
+
+    async def command(self, line: str, is_done: Callable[[str], bool] = None,
+                      timeout: float = 3.0, quiet: float = 0.05, eol: str = "\n",
+                      settle: float = 0.0) -> List[str]:
+        """
+        Write line and collect the reply lines.
+        With is_done the reply ends at the first line it accepts (TimeoutError after timeout);
+        without it the reply ends once no line has arrived for `quiet` seconds.
+        settle: time to wait after writing before the reply can start (e.g. a motor run).
+        """
+        async with self._lock:
+            while not self._lines.empty():
+                self._lines.get_nowait()
+            self._busy = True
+            try:
+                self.serial.write((line + eol).encode())
+                if settle:
+                    await asyncio.sleep(settle)
+                lines = []
+                deadline = self.loop.time() + timeout
+                while True:
+                    remaining = deadline - self.loop.time()
+                    if remaining <= 0:
+                        if is_done is not None:
+                            raise TimeoutError(f"No reply to '{line}' within {timeout}s")
+                        return lines
+                    wait = remaining if is_done is not None else min(quiet, remaining)
+                    try:
+                        reply = await asyncio.wait_for(self._lines.get(), wait)
+                    except asyncio.TimeoutError:
+                        if is_done is not None:
+                            raise TimeoutError(f"No reply to '{line}' within {timeout}s")
+                        return lines
+                    lines.append(reply)
+                    if is_done is not None and is_done(reply):
+                        return lines
+            finally:
+                self._busy = False
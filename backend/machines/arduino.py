@@ -1,19 +1,30 @@
+import asyncio
 import serial
 import time
 import logging
 from sections.utils import Connection, Pose
+from machines.aio_serial import AsyncSerial
+
+
+def _in_loop(loop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
 
 
 class Arduino:
     def __init__(self):
         self.connection = None
+        self.aio = None
 
     def connect(self, method, ip, port, com, baud, timeout=3):
         """Connect to Arduino via serial"""
+        self.close_async()
+        if self.connection is not None and self.connection.serial is not None and self.connection.serial.is_open:
+            self.connection.serial.close()
         self.connection = Connection(method, ip, port, com, baud, timeout)
         logging.warning(f'{self.connection}')
-        if self.connection.serial is not None and self.connection.serial.is_open:
-            self.connection.serial.close()
 
         self.connection.serial = serial.Serial(com, baud, timeout=timeout)
         time.sleep(2)
@@ -26,6 +37,32 @@ class Arduino:
             return self.connection.connected
         return False
     
+    async def open_async(self):
+        """Read the serial port from the running event loop"""
+        if not self.is_connected():
+            return False
+        if self.aio is None or not self.aio.is_open:
+            self.aio = await AsyncSerial(self.connection.serial).open()
+        return True
+
+    def close_async(self):
+        if self.aio is not None:
+            self.aio.close()
+            self.aio = None
+
+    async def ascrew(self, direction: str, duration: float = 0, speed: int = 150):
+        """screw() without holding a thread while the motor runs"""
+        if not self.is_connected():
+            logging.info(f"Arduino not connected")
+            raise RuntimeError("Arduino not connected")
+        if self.aio is None or not self.aio.is_open:
+            return await asyncio.to_thread(self.screw, direction, duration, speed)
+
+        cmd = "STOP" if direction.upper() == "STOP" else f"{direction.upper()}"
+        logging.info(f"arduino screwdriver cmd:{cmd}")
+        # the sketch replies (if at all) while/after the motor runs; no line terminator expected
+        return await self.aio.command(cmd, eol="", settle=duration + 0.05, timeout=duration + 0.5)
+
     def screw(self, direction: str, duration: float = 0, speed: int = 150):
         """
         duration: seconds (ignored for STOP)
@@ -35,6 +72,13 @@ class Arduino:
             logging.info(f"Arduino not connected")
             raise RuntimeError("Arduino not connected")
 
+        if self.aio is not None and self.aio.is_open:
+            # the event loop's reader owns the port: run the command there and wait from this thread
+            loop = self.aio.loop
+            if _in_loop(loop):
+                raise RuntimeError("Arduino.screw would block the event loop, await ascrew() instead")
+            return asyncio.run_coroutine_threadsafe(self.ascrew(direction, duration, speed), loop).result()
+
         if direction.upper() == "STOP":
             cmd = "STOP"
         else:
@@ -3,7 +3,21 @@ import time
 import logging
 import re
 from sections.utils import Connection, Pose
+from machines.tinyg import Command, TinyGStreamer, REALTIME, parse_ack, is_report, STATUS_REPORT_SETUP, MACHINE_STATES, IDLE_STATES, MOTION, reply_report, reply_value, response_error
+import json
+from machines.aio_serial import AsyncSerial
+from machines.jog import Jogger
+from simulation.liteplacer import SimulatedTinyG
 import threading
+import asyncio
+import contextlib
+
+
+def _in_loop(loop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
 
 
 class Gantry:
@@ -13,31 +27,154 @@ class Gantry:
         self.holders = []
         self.locations = []
         self.toolend = None
+        self.workspace = None  # optional [[xmin, xmax], [ymin, ymax], [zmin, zmax]]
+        self.limits = None     # optional overrides of sections.kinematics.DEFAULT_LIMITS
         self._io_lock = threading.Lock()
+        self.streamer = None
+        self.aio = None
+        self._motion_lock = asyncio.Lock()
+        # latest pushed status report, see enable_status_reports()
+        self.status = {}
+        self.status_at = None
+        self.status_reports = False  # JSON mode with pushed reports, see enable_status_reports()
+        self._status_seeded = False
+        self._status_lock = threading.Lock()
+        # current motion program, see run_trajectory()
+        self.trajectory = None
+        self._line_number = 0
+        # tool changes
+        self.tool_change_speed = 2000  # mm/min
+        self.motion_timeout = 60.0     # s, longest single move
+        self.jogger = Jogger(self)
+        # in-process backend while connection.serial is absent, see use_simulator()
+        self.simulator = None
 
 
     def connect(self, method, ip, port, com, baud, timeout=3):
         # close existing serial if open
+        self.stop_streaming()
+        self.close_async()
         if self.connection and self.connection.serial:
             if self.connection.serial.is_open:
                 self.connection.serial.close()
 
         self.connection = Connection(method, ip, port, com, baud, timeout)
-        self.connection.serial = serial.Serial(com, baud, timeout=timeout)
+        self.status, self.status_at = {}, None
+        self.status_reports = self._status_seeded = False
+        if method == "sim":
+            self.use_simulator()
+            self.set_position(**self.toolend['position'])
+            logging.info("Connected to simulated TinyG")
+            return True
+        try:
+            self.connection.serial = serial.Serial(com, baud, timeout=timeout)
+        except serial.SerialException:
+            # no port: do not fall back to the simulator as if the TinyG had answered
+            self.connection = Connection()
+            raise
         self.set_position(**self.toolend['position'])
         logging.info(f"Connected to TinyG on {com}")
         return True
 
+    def use_simulator(self, simulator: SimulatedTinyG = None):
+        """Answer commands from an in-process SimulatedTinyG while no serial port is open"""
+        self.simulator = simulator or SimulatedTinyG()
+        self.simulator.connected = True
+        return self.simulator
+
+    @property
+    def simulated(self) -> bool:
+        """Connected without a serial port: a SimulatedTinyG (started on first use) answers"""
+        if self.connection is None or not self.connection.method or self.connection.serial is not None:
+            return False
+        if self.simulator is None:
+            self.use_simulator()
+        return True
+
     def is_connected(self) -> bool:
+        if self.simulated:
+            self.connection.connected = self.simulator.connected
+            return self.connection.connected
         if self.connection:
             self.connection.connected = self.connection.serial is not None and self.connection.serial.is_open
             return self.connection.connected
         return False
 
+    def start_streaming(self, max_outstanding=4):
+        """Hand the serial port to a TinyGStreamer: flow-controlled sends, matched responses"""
+        if not self.is_connected() or self.simulated:
+            return False
+        if self.streamer is None or not self.streamer.running:
+            # the streamer's reader thread takes over the port from the async transport
+            self.close_async()
+            self._status_seeded = False  # reports pushed before the reader started are lost
+            self.streamer = TinyGStreamer(self.connection.serial, max_outstanding=max_outstanding,
+                                          on_report=self._on_report)
+            self.streamer.start()
+        return True
+
+    def stop_streaming(self):
+        if self.streamer is not None:
+            self.streamer.stop()
+            self.streamer = None
+
+    @contextlib.contextmanager
+    def streaming(self, max_outstanding=4):
+        """
+        Streamer owns the port inside the block. An async transport it takes the port
+        from (see open_async) is reopened on its event loop afterwards, so callers
+        running in a worker thread leave the gantry as they found it.
+        """
+        loop = self.aio.loop if self.aio is not None and self.aio.is_open else None
+        if loop is not None and _in_loop(loop):
+            raise RuntimeError("Gantry.streaming would block the event loop")
+        try:
+            yield self.start_streaming(max_outstanding)
+        finally:
+            if loop is not None:
+                self.stop_streaming()
+                asyncio.run_coroutine_threadsafe(self.open_async(), loop).result()
+
+    def stream(self, commands, timeout=30.0, on_progress=None):
+        """Stream many G-code lines at the controller's rate; returns the acknowledged Commands"""
+        if self.simulated:
+            return self._simulate_stream(commands, on_progress)
+        if not self.start_streaming():
+            return False
+        return self.streamer.stream(commands, timeout=timeout, on_progress=on_progress)
+
+    def _simulate_stream(self, lines, on_progress=None):
+        commands = []
+        for i, line in enumerate(lines):
+            cmd = Command(line, i)
+            cmd.response = self.simulator.readlines(line)
+            cmd.error = response_error(cmd.response)
+            cmd.done.set()
+            commands.append(cmd)
+            if on_progress:
+                on_progress(i, cmd)
+        return commands
+
     def send(self, command, delay=0.05):
         if not self.is_connected():
             return False
 
+        if self.simulated:
+            return self.simulator.readlines(command)
+
+        if self.streamer is not None and self.streamer.running:
+            if command in REALTIME:
+                self.streamer.write_realtime(command)
+                return []
+            return self.streamer.send(command)
+
+        if self.aio is not None and self.aio.is_open:
+            # the event loop owns the port: run the command there and wait from this thread
+            loop = self.aio.loop
+            if _in_loop(loop):
+                raise RuntimeError("Gantry.send would block the event loop, await asend() instead")
+            return asyncio.run_coroutine_threadsafe(self.asend(command), loop).result()
+
         with self._io_lock:
             self.connection.serial.write((command + "\n").encode())
             time.sleep(delay)
@@ -50,10 +187,172 @@ class Gantry:
             return lines
 
 
+    # ------------------------------------------------------------------
+    # asyncio API: awaits the controller's reply instead of sleeping in a thread
+    # ------------------------------------------------------------------
+    async def open_async(self):
+        """Read the serial port from the running event loop"""
+        if not self.is_connected() or self.simulated or (self.streamer is not None and self.streamer.running):
+            return False
+        if self.aio is None or not self.aio.is_open:
+            self._status_seeded = False
+            self.aio = await AsyncSerial(self.connection.serial, on_unsolicited=self._on_line,
+                                         is_report=is_report).open()
+            # keeps each G90/G91 + G1 pair together when requests overlap
+            self._motion_lock = asyncio.Lock()
+        return True
+
+    def close_async(self):
+        if self.aio is not None:
+            self.aio.close()
+            self.aio = None
+
+    async def asend(self, command, timeout=10.0):
+        if not self.is_connected():
+            return False
+        if self.aio is None or not self.aio.is_open:
+            return await asyncio.to_thread(self.send, command)
+        if command in REALTIME:
+            self.aio.write(command)
+            return []
+        return await self.aio.command(command, is_done=lambda line: parse_ack(line)[0], timeout=timeout)
+
+    async def aget_info(self):
+        if not self.is_connected():
+            return False
+        info = self._status_snapshot()
+        if info is not None:
+            return info
+        if self.status_reports:
+            sr = reply_report(await self.asend('{"sr":n}'))
+            if sr is not None:
+                return self._info(self._seed_status(sr))
+        return self._parse_info(await self.asend("?"))
+
+    async def aset_position(self, x, y, z, a):
+        logging.info(f"set_position {x, y, z, a}")
+        return await self.asend(f"G92 X{x} Y{y} Z{z} A{a}")
+
+    async def agoto(self, x, y, z, a, speed):
+        """Returns once the move is queued in the TinyG planner"""
+        async with self._motion_lock:
+            await self.asend("G90")
+            lines = await self.asend(f"G1 X{x} Y{y} Z{z} A{a} F{speed}")
+        logging.info(f"goto {x, y, z, a, speed}")
+        return lines
+
+    async def astep(self, x, y, z, a, speed):
+        async with self._motion_lock:
+            await self.asend("G91")
+            return await self.asend(f"G1 X{x} Y{y} Z{z} A{a} F{speed}")
+
+    async def aplanner_moves(self):
+        """Moves in the TinyG planner, the executing one included; None outside JSON mode"""
+        if not self.status_reports:
+            return None
+        free = reply_value(await self.asend('{"qr":n}'), "qr")
+        return None if free is None else TinyGStreamer.PLANNER_BUFFERS - int(free)
+
+    async def aunlock(self, time_s: float):
+        await self.asend("M8")
+        await asyncio.sleep(time_s)
+        await self.asend("M9")
+
+    # ------------------------------------------------------------------
+    # pushed status reports: get_info reads the cached snapshot, not the wire
+    # ------------------------------------------------------------------
+    def enable_status_reports(self, interval_ms=100):
+        """Switch TinyG to JSON mode and have it push filtered status reports every interval_ms"""
+        for command in STATUS_REPORT_SETUP + [f'{{"si":{interval_ms}}}']:
+            self.send(command)
+        self.status_reports = True
+        self._seed_status(reply_report(self.send('{"sr":n}')))
+        return True
+
+    async def aenable_status_reports(self, interval_ms=100):
+        for command in STATUS_REPORT_SETUP + [f'{{"si":{interval_ms}}}']:
+            await self.asend(command)
+        self.status_reports = True
+        self._seed_status(reply_report(await self.asend('{"sr":n}')))
+        return True
+
+    def _on_line(self, line):
+        """Pushed {"sr":...} reports only; query replies never merge into the cache"""
+        if not line.startswith('{"sr"'):
+            return
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            return
+        if isinstance(msg, dict):
+            self._on_report(msg)
+
+    @staticmethod
+    def _report_fields(sr):
+        keys = {"posx": "x", "posy": "y", "posz": "z", "posa": "a", "feed": "feedrate", "vel": "velocity"}
+        fields = {name: float(sr[key]) for key, name in keys.items() if key in sr}
+        if "line" in sr:
+            fields["line"] = int(sr["line"])
+        if "stat" in sr:
+            fields["machine_state"] = MACHINE_STATES.get(sr["stat"], str(sr["stat"]))
+        return fields
+
+    def _on_report(self, msg):
+        """Merge a (filtered, partial) pushed {"sr":...} report into the status snapshot"""
+        sr = msg.get("sr")
+        if not isinstance(sr, dict):
+            return
+        with self._status_lock:
+            self.status.update(self._report_fields(sr))
+            self.status_at = time.monotonic()
+
+    def _seed_status(self, sr):
+        """
+        Replace the cache with a full {"sr":n} reply, but only while the machine is idle.
+        Filtered reports carry the fields changed since the last *pushed* report; that
+        baseline matches a full report once motion has stopped, never mid-move.
+        Returns the reply's fields either way.
+        """
+        if sr is None:
+            return None
+        fields = self._report_fields(sr)
+        if fields.get("machine_state") in IDLE_STATES:
+            with self._status_lock:
+                self.status = dict(fields)
+                self.status_at = time.monotonic()
+                self._status_seeded = True
+        return fields
+
+    def _info(self, fields):
+        info = {"x": 0.0, "y": 0.0, "z": 0.0, "a": 0.0, "feedrate": 0.0, "velocity": 0.0,
+                "machine_state": None, **fields}
+        if self.toolend and self.toolend['position']:
+            self.toolend['position'] = {'x': info['x'], 'y': info['y'], 'z': info['z'], 'a': info['a']}
+        return info
+
+    def _status_snapshot(self):
+        """Cached status, only once seeded and while a background reader keeps it current"""
+        reading = (self.aio is not None and self.aio.is_open) or \
+                  (self.streamer is not None and self.streamer.running)
+        if not self._status_seeded or not reading:
+            return None
+        with self._status_lock:
+            fields = dict(self.status)
+        return self._info(fields)
+
     def get_info(self):
         if not self.is_connected():
             return False
-        lines = self.send("?")
+        info = self._status_snapshot()
+        if info is not None:
+            return info
+        if self.status_reports:
+            sr = reply_report(self.send('{"sr":n}'))
+            if sr is not None:
+                return self._info(self._seed_status(sr))
+        return self._parse_info(self.send("?"))
+
+    def _parse_info(self, lines):
         info = {
             "x": 0.0,
             "y": 0.0,
@@ -88,6 +387,156 @@ class Gantry:
         return info
 
 
+    # ------------------------------------------------------------------
+    # trajectories: a whole list of moves queued in order as one program
+    # ------------------------------------------------------------------
+    def _program(self, lines):
+        """Number the motion lines (G0-G3) of a program N.. so status reports show the segment"""
+        numbered, segment_of = [], []
+        first = self._line_number + 1
+        for line in lines:
+            if line.split(" ", 1)[0] in MOTION:
+                self._line_number += 1
+                line = f"N{self._line_number} {line}"
+            numbered.append(line)
+            segment_of.append(self._line_number - first + 1)
+        self.trajectory = {"segments": self._line_number - first + 1, "first_line": first, "queued": 0,
+                           "state": "queueing", "error": None}
+        return numbered, segment_of
+
+    @staticmethod
+    def _trajectory_lines(waypoints):
+        """G-code for waypoints [{x, y, z, a, speed}], one G1 per segment"""
+        return ["G90"] + [f"G1 X{wp['x']} Y{wp['y']} Z{wp['z']} A{wp['a']} F{wp['speed']}" for wp in waypoints]
+
+    def _segment_queued(self, segments, cmd=None):
+        self.trajectory["queued"] = segments
+        if cmd is not None and cmd.error:
+            self.trajectory["error"] = cmd.error
+
+    def run_trajectory(self, waypoints, timeout=30.0):
+        """Stream the waypoints as one program; returns once all are in the planner"""
+        return self.run_program(self._trajectory_lines(waypoints), timeout)
+
+    async def arun_trajectory(self, waypoints, timeout=30.0):
+        return await self.arun_program(self._trajectory_lines(waypoints), timeout)
+
+    def run_program(self, lines, timeout=30.0):
+        """Stream G-code lines (e.g. sections.gcode.compile_path output) in order as one program"""
+        lines, segment_of = self._program(lines)
+        try:
+            if self.streamer is not None and self.streamer.running:
+                commands = self.streamer.stream(lines, timeout=timeout,
+                                                on_progress=lambda i, cmd: self._segment_queued(segment_of[i], cmd))
+                failed = next((cmd for cmd in commands if cmd.error), None)
+                if failed is not None:
+                    self._program_failed(failed.line, failed.error)
+            else:
+                for line, segments in zip(lines, segment_of):
+                    error = response_error(self.send(line))
+                    if error:
+                        self._program_failed(line, error)
+                    self._segment_queued(segments)
+            self.trajectory["state"] = "queued"
+        except Exception as e:
+            self.trajectory.update(state="failed", error=str(e))
+            raise
+        return self.trajectory_progress()
+
+    async def arun_program(self, lines, timeout=30.0):
+        lines, segment_of = self._program(lines)
+        try:
+            async with self._motion_lock:
+                for line, segments in zip(lines, segment_of):
+                    error = response_error(await self.asend(line, timeout=timeout))
+                    if error:
+                        self._program_failed(line, error)
+                    self._segment_queued(segments)
+            self.trajectory["state"] = "queued"
+        except Exception as e:
+            self.trajectory.update(state="failed", error=str(e))
+            raise
+        return self.trajectory_progress()
+
+    def _program_failed(self, line, error):
+        """A program line was rejected: drop the moves queued after it and raise"""
+        self.hold(flush=True)
+        raise RuntimeError(f"TinyG rejected '{line}': {error}")
+
+    def trajectory_progress(self):
+        """Segments queued in the planner and, from the status report line number, executed"""
+        if self.trajectory is None:
+            return None
+        progress = dict(self.trajectory)
+        line = self.status.get("line")
+        executed = None
+        if line is not None and line >= progress["first_line"]:
+            executed = min(line - progress["first_line"] + 1, progress["segments"])
+            if progress["state"] == "queued" and executed == progress["segments"] \
+                    and self.status.get("machine_state") in ("Stop", "End"):
+                progress["state"] = "done"
+        progress["executed"] = executed
+        return progress
+
+    # ------------------------------------------------------------------
+    # motion completion: wait for the controller to report the planner empty
+    # ------------------------------------------------------------------
+    def _machine_state(self):
+        """
+        Machine state asked of the controller on every call, never read from the cache:
+        filtered reports only carry fields changed since the last *pushed* report, so a
+        move shorter than the report interval goes Run -> Stop without stat being pushed
+        again, and a query reply taken mid-move would stay in the cache as Run.
+        """
+        if self.status_reports:
+            sr = reply_report(self.send('{"sr":n}'))
+            if sr is not None:
+                return MACHINE_STATES.get(sr.get("stat"))
+        info = self._parse_info(self.send("?"))
+        return info["machine_state"] if info else None
+
+    def _planner_empty(self):
+        if self.streamer is None or not self.streamer.running:
+            return True
+        free = self.streamer.queue_free
+        return not self.streamer.outstanding and (free is None or free >= self.streamer.PLANNER_BUFFERS)
+
+    def wait_motion_complete(self, timeout=None, poll=0.05):
+        """Block until every queued move has finished; TimeoutError after timeout seconds"""
+        timeout = self.motion_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        if self.streamer is not None and self.streamer.running:
+            if not self.streamer.wait_idle(timeout):
+                raise TimeoutError(f"TinyG did not acknowledge queued moves within {timeout}s")
+        while True:
+            state = self._machine_state()
+            if state in IDLE_STATES and self._planner_empty():
+                return True
+            if state == "Alarm":
+                raise RuntimeError("TinyG is in alarm state")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Motion did not complete within {timeout}s (state {state})")
+            time.sleep(poll)
+
+    async def await_motion_complete(self, timeout=None, poll=0.05):
+        timeout = self.motion_timeout if timeout is None else timeout
+        if self.aio is None or not self.aio.is_open:
+            return await asyncio.to_thread(self.wait_motion_complete, timeout, poll)
+        deadline = time.monotonic() + timeout
+        while True:
+            sr = reply_report(await self.asend('{"sr":n}')) if self.status_reports else None
+            if sr is not None:
+                state = MACHINE_STATES.get(sr.get("stat"))
+            else:
+                state = (self._parse_info(await self.asend("?")) or {}).get("machine_state")
+            if state in IDLE_STATES:
+                return True
+            if state == "Alarm":
+                raise RuntimeError("TinyG is in alarm state")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Motion did not complete within {timeout}s (state {state})")
+            await asyncio.sleep(poll)
+
     def set_position(self, x, y, z, a):
         logging.info(f"set_position {x, y, z, a}")
         return self.send(f"G92 X{x} Y{y} Z{z} A{a}")
@@ -117,59 +566,88 @@ class Gantry:
         time.sleep(time_s)
         self.send("M9")
 
+    def _write_realtime(self, char):
+        if self.simulated:
+            self.simulator.execute(char)
+        elif self.streamer is not None and self.streamer.running:
+            self.streamer.write_realtime(char)
+        elif self.aio is not None and self.aio.is_open:
+            self.aio.write(char)
+        else:
+            self.connection.serial.write(char.encode())
+
+    def hold(self, flush=False):
+        """Feed hold (!) immediately; flush=True also drops every queued move (%)"""
+        if not self.is_connected():
+            return False
+        self._write_realtime("!")
+        if flush:
+            self._write_realtime("%")
+        return True
+
     def reset(self):
-        self.connection.serial.write(b"\x18")
+        self._write_realtime("\x18")
         time.sleep(0.2)
     
-    def detach(self, target=None):
+    def _location(self, name):
+        for loc in self.locations:
+            if loc.get("name") == name:
+                return loc
+        raise KeyError(f"No gantry location '{name}'")
+
+    def _move(self, pose, timeout=None):
+        """Queue a move to a named location and wait until it has finished"""
+        self._goto(pose["x"], pose["y"], pose["z"], pose["a"], self.tool_change_speed)
+        self.wait_motion_complete(timeout)
+
+    def _change_tool(self, holder_name, timeout=None):
+        """holder out -> holder in -> release the lock -> holder out"""
+        holder_out_pose = self._location(f"{holder_name}_out")
+        holder_in_pose = self._location(f"{holder_name}_in")
+        self._move(holder_out_pose, timeout)
+        self._move(holder_in_pose, timeout)
+        self.unlock(1)
+        self._move(holder_out_pose, timeout)
+
+    def effector_holders(self) -> dict:
+        """{effector: holder name} for the stored effectors and the toolend's, which detach() puts in the first empty holder"""
+        holders = {holder["effector"]: holder["name"] for holder in self.holders if holder["effector"]}
+        effector = (self.toolend or {}).get("effector")
+        empty = [holder["name"] for holder in self.holders if not holder["effector"]]
+        if effector and effector not in holders and empty:
+            holders[effector] = empty[0]
+        return holders
+
+    def detach(self, target=None, timeout=None):
         """detach current end effector to target holder"""
         target_holder = None
-        if target is None:
-            for holder in self.holders:
-                if holder.effector == "":
-                    target_holder = holder
-                    break
-        else:
-            for holder in self.holders:
-                if holder.name == target:
-                    target_holder = holder
-                    break
+        for holder in self.holders:
+            if (target is None and holder["effector"] == "") or holder["name"] == target:
+                target_holder = holder
+                break
 
         if target_holder is None:
             return False
-        
-        holder_out_pose = self.locations[f"{target}_out"]
-        self.goto(holder_out_pose)
-        time.sleep(10)
-        holder_in_pose = self.locations[f"{target}_in"]
-        self.goto(holder_in_pose)
-        time.sleep(3)
-        self.unlock()
-        time.sleep(1)
-        self.goto(holder_out_pose)
+
+        self._change_tool(target_holder["name"], timeout)
+        target_holder["effector"] = self.toolend["effector"]
+        self.toolend["effector"] = ""
         return True
-    
-    def attach(self, target):
+
+    def attach(self, target, timeout=None):
         """attach end effector from its holder to the toolend. detach first if required"""
-        if self.toolend.effector != "":
-            self.detach()
-        
+        if self.toolend["effector"] != "":
+            self.detach(timeout=timeout)
+
         target_holder = None
         for holder in self.holders:
-            if holder.name == target:
+            if holder["name"] == target:
                 target_holder = holder
 
         if target_holder is None:
             return False
-        
-        holder_out_pose = self.locations[f"{target}_out"]
-        self.goto(holder_out_pose)
-        time.sleep(10)
-        holder_in_pose = self.locations[f"{target}_in"]
-        self.goto(holder_in_pose)
-        time.sleep(3)
-        self.unlock()
-        time.sleep(1)
-        self.goto(holder_out_pose)
-        return True
 
+        self._change_tool(target, timeout)
+        self.toolend["effector"] = target_holder["effector"]
+        target_holder["effector"] = ""
+        return True
@@ -1,7 +1,13 @@
+import asyncio
+import re
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
 import time
 import logging
+from typing import List
 from sections.utils import Connection
 logging.basicConfig(level=logging.INFO)
 
@@ -9,51 +15,59 @@ logging.basicConfig(level=logging.INFO)
 # STATUS PARSER
 # ============================================================
 
+STATUS_KEYS = [
+    "Active ID:",
+    "Position:",
+    "Device Mode:",
+    "Voltage:",
+    "Load:",
+    "Speed:",
+    "Temper:",
+    "Speed Set:",
+    "ID to Set:",
+    "Mode:",
+    "Torque"
+]
+NUMERIC_KEYS = {"Position:", "Voltage:", "Load:", "Speed:", "Temper:", "Speed Set:"}
+FIELD_NAMES = {key: key.replace(":", "").replace(" ", "_").lower() for key in STATUS_KEYS}
+
+# one alternation of all keys, longest first; scanning left to right also keeps
+# "Mode:" from matching inside "Device Mode:"
+_KEY_PATTERN = re.compile("|".join(re.escape(key) for key in sorted(STATUS_KEYS, key=len, reverse=True)))
+
+
 def parse_status(raw: str):
+    """
+    Fields of a /readSTS page in one scan: each value runs from its key to the
+    next key. Missing keys are left out; numbers that do not parse stay strings.
+    """
     if not raw:
         return {}
 
-    keys = [
-        "Active ID:",
-        "Position:",
-        "Device Mode:",
-        "Voltage:",
-        "Load:",
-        "Speed:",
-        "Temper:",
-        "Speed Set:",
-        "ID to Set:",
-        "Mode:",
-        "Torque"
-    ]
-    numeric_keys = ["Position", "Voltage", "Load", "Speed", "Temper", "Speed Set"]
-
-    status = {}
     text = raw.replace("<p>", " ")
+    matches = list(_KEY_PATTERN.finditer(text))
+    status = {}
 
-    for key in keys:
-        if key not in text:
-            continue
+    for i, match in enumerate(matches):
+        key = match.group()
+        name = FIELD_NAMES[key]
+        if name in status:
+            continue  # first occurrence wins
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        value = text[match.end():end].strip()
+        if key in NUMERIC_KEYS:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        status[name] = value
 
-        start = text.find(key) + len(key)
-        end = len(text)
+    return status
 
-        for next_key in keys:
-            if next_key == key:
-                continue
-            idx = text.find(next_key, start)
-            if idx != -1:
-                end = min(end, idx)
 
-        value = text[start:end].strip()
-        clean_key = key.replace(":", "").replace(" ", "_").lower()
-
-        try:
-            status[clean_key] = float(value) if key.replace(":", "") in numeric_keys else value
-        except Exception:
-            status[clean_key] = value
-
-    return status
+def parse_statuses(raws: List[str]) -> List[dict]:
+    """parse_status for a batch of raw status pages"""
+    return [parse_status(raw) for raw in raws]
 
 
 # ============================================================
@@ -61,12 +75,53 @@ def parse_status(raw: str):
 # ============================================================
 
 class ST3020Gripper:
+    # (connect, read) seconds: the ESP32 is on the local network and answers at once
+    HTTP_TIMEOUT = (1.0, 3.0)
+
     def __init__(self):
         self.connection = Connection()
         self.status = {}
         self.servo_id = None
+        self._http = None
+        self._ahttp = None       # httpx.AsyncClient of the event loop in _ahttp_loop
+        self._ahttp_loop = None
+        self._motor_task = None
+
+    def _session(self) -> requests.Session:
+        """Keep-alive session: commands reuse one open socket to the ESP32"""
+        if self._http is None:
+            session = requests.Session()
+            # retry only failed connects (e.g. a keep-alive socket the ESP32 dropped);
+            # a command that reached the gripper is never sent twice
+            retry = Retry(total=1, connect=1, read=0, status=0, other=0, redirect=0)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry)
+            session.mount("http://", adapter)
+            self._http = session
+        return self._http
+
+    def _close_session(self):
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        client, self._ahttp = self._ahttp, None
+        if client is not None and not self._ahttp_loop.is_closed():
+            # may be called from a worker thread: close on the loop the client belongs to
+            asyncio.run_coroutine_threadsafe(client.aclose(), self._ahttp_loop)
+
+    def _async_session(self) -> httpx.AsyncClient:
+        """_session() for the event loop: keep-alive client, failed connects retried once"""
+        loop = asyncio.get_running_loop()
+        if self._ahttp is None or self._ahttp_loop is not loop:
+            self._ahttp = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(retries=1),
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=1),
+                timeout=httpx.Timeout(self.HTTP_TIMEOUT[1], connect=self.HTTP_TIMEOUT[0]),
+            )
+            self._ahttp_loop = loop
+        return self._ahttp
 
     def connect(self, method, ip, port, com, baud, timeout=10):
+        self._close_session()
         self.connection = Connection(method, ip, port, com, baud, timeout)
 
         try:
@@ -98,7 +153,7 @@ class ST3020Gripper:
         )
 
         try:
-            r = requests.get(
+            r = self._session().get(
                 f"http://{self.connection.ip}/cmd",
                 params={
                     "arg0": arg0,
@@ -106,7 +161,7 @@ class ST3020Gripper:
                     "arg2": arg2,
                     "arg3": arg3
                 },
-                timeout=3
+                timeout=self.HTTP_TIMEOUT
             )
 
             r.raise_for_status()
@@ -122,9 +177,9 @@ class ST3020Gripper:
             return {"connected": False}
 
         try:
-            r = requests.get(
+            r = self._session().get(
                 f"http://{self.connection.ip}/readSTS",
-                timeout=3
+                timeout=self.HTTP_TIMEOUT
             )
             self.status = parse_status(r.text)
             self.connection.connected = True
@@ -183,4 +238,82 @@ class ST3020Gripper:
         self.send_command(1, 4, speed)
         return {"ok": True}
 
+    # -------------------------
+    # ASYNC (FastAPI routes): a pooled httpx client on the event loop, no worker thread
+    # -------------------------
+    async def asend_command(self, arg0, arg1, arg2=0, arg3=0):
+        logging.info(
+            f'sending command to {self.connection.ip} '
+            f'{arg0}, {arg1}, {arg2}, {arg3}'
+        )
+
+        try:
+            r = await self._async_session().get(
+                f"http://{self.connection.ip}/cmd",
+                params={
+                    "arg0": arg0,
+                    "arg1": arg1,
+                    "arg2": arg2,
+                    "arg3": arg3
+                }
+            )
+
+            r.raise_for_status()
+            return r.text
 
+        except httpx.HTTPError as e:
+            logging.error(f"Gripper HTTP failed: {e}")
+            self.connection.connected = False
+            return None
+
+    async def aget_status(self):
+        if not self.connection or not self.connection.ip:
+            return {"connected": False}
+
+        try:
+            r = await self._async_session().get(f"http://{self.connection.ip}/readSTS")
+            self.status = parse_status(r.text)
+            self.connection.connected = True
+            return self.status
+
+        except httpx.HTTPError as e:
+            logging.error(f"Status read failed: {e}")
+            self.connection.connected = False
+            return {"connected": False}
+
+    async def _arun_motor_for(self, duration_s: float, command: int, speed: int=None):
+        if speed is not None:
+            await self.aset_speed(speed)
+            await asyncio.sleep(0.05)  # small settle delay
+        try:
+            await self.asend_command(1, command)
+            await asyncio.sleep(duration_s)
+        except Exception as e:
+            logging.error(f"Motor run failed: {e}")
+        finally:
+            await self.asend_command(1, 2)  # stop, also when the run is cancelled
+
+    def _start_motor(self, duration_s: float, command: int, speed: int=None):
+        """Run the motor as a task so the route returns at once, like open()/close()"""
+        if self._motor_task is not None and not self._motor_task.done():
+            self._motor_task.cancel()
+        self._motor_task = asyncio.get_running_loop().create_task(
+            self._arun_motor_for(duration_s, command, speed))
+
+    async def aopen(self, time_s: float, speed: int):
+        self._start_motor(time_s, 1, speed)
+
+    async def aclose(self, time_s: float, speed: int):
+        self._start_motor(time_s, 6, speed)
+
+    async def aspeed_up(self):
+        await self.asend_command(1, 7)
+        return {"ok": True}
+
+    async def aspeed_down(self):
+        await self.asend_command(1, 8)
+        return {"ok": True}
+
+    async def aset_speed(self, speed: int):
+        await self.asend_command(1, 4, speed)
+        return {"ok": True}
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import math
+from typing import List, Optional, Tuple
+
+
+def _length(delta) -> float:
+    """Move length like TinyG: over XYZ, or |A| for a rotation-only move"""
+    length = math.sqrt(sum(d * d for d in delta[:3]))
+    return length if length > 1e-9 else abs(delta[3])
+
+
+class Jogger:
+    """
+    Turns operator jog steps for one gantry into continuous motion.
+
+    Pending steps are summed into one relative move at a time, and one merged
+    move is kept queued ahead of the executing one: the planner queue
+    ({"qr":n}) is the backpressure, so a held jog runs through the planner's
+    junctions instead of stopping between moves. A merged move covers at most
+    horizon seconds at its speed (steps beyond that are dropped), so after the
+    last step the machine runs on for at most two short moves. Release with
+    cancel(): feed hold and queue flush (!%) stop it at once.
+    """
+
+    def __init__(self, gantry, horizon: float = 0.3, ahead: int = 1, poll: float = 0.02):
+        self.gantry = gantry
+        self.horizon = horizon
+        self.ahead = ahead
+        self.poll = poll
+        self._pending: List[Tuple[float, float, float, float, float]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"received": 0, "moves": 0, "merged": 0, "clipped": 0}
+
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def jog(self, x, y, z, a, speed) -> int:
+        """Queue a relative step; returns the number of steps waiting to be merged"""
+        self._pending.append((x, y, z, a, speed))
+        self.stats["received"] += 1
+        if not self.active:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return len(self._pending)
+
+    def _take(self):
+        """Sum of the pending steps, capped to horizon seconds of motion, and their fastest speed"""
+        steps, self._pending = self._pending, []
+        delta = [sum(step[i] for step in steps) for i in range(4)]
+        speed = max(step[4] for step in steps)
+        # a single step always runs in full, however long
+        limit = max(max(_length(step) for step in steps), speed / 60.0 * self.horizon)
+        length = _length(delta)
+        if length > limit:
+            delta = [d * limit / length for d in delta]
+            self.stats["clipped"] += 1
+        self.stats["merged"] += len(steps)
+        return delta, speed
+
+    async def _wait_room(self):
+        """Until at most `ahead` moves wait behind the executing one; new steps collect meanwhile"""
+        while True:
+            queued = await self.gantry.aplanner_moves()
+            if queued is None:
+                # no queue reports outside JSON mode: stop between moves
+                await self.gantry.await_motion_complete()
+                return
+            if queued <= self.ahead:
+                return
+            await asyncio.sleep(self.poll)
+
+    async def _run(self):
+        try:
+            while self._pending:
+                (x, y, z, a), speed = self._take()
+                await self.gantry.astep(x, y, z, a, speed)
+                self.stats["moves"] += 1
+                await self._wait_room()
+        except Exception as e:
+            self._pending = []
+            logging.error(f"Jog failed: {e}")
+
+    async def cancel(self):
+        """Feed hold and flush the TinyG queue (!%), then forget pending steps"""
+        self.gantry.hold(flush=True)
+        self._pending = []
+        if self.active:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
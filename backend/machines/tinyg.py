@@ -0,0 +1,324 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+
+class Command:
+    """One G-code line sent to the TinyG and the response lines matched to it"""
+
+    def __init__(self, line: str, index: int = 0):
+        self.line = line
+        self.index = index
+        self.response: List[str] = []
+        self.error: Optional[str] = None
+        self.sent_at = None
+        self.acked_at = None
+        self.done = threading.Event()
+
+    def wait(self, timeout: float = None) -> List[str]:
+        if not self.done.wait(timeout):
+            raise TimeoutError(f"TinyG did not acknowledge '{self.line}' within {timeout}s")
+        return self.response
+
+    def __repr__(self):
+        return f"Command({self.line!r}, done={self.done.is_set()}, error={self.error})"
+
+
+# Single-character commands TinyG acts on immediately and never acknowledges
+REALTIME = {"!", "~", "%", "\x18"}
+
+
+# G-code words of lines that move the machine (numbered for trajectory progress)
+MOTION = ("G0", "G1", "G2", "G3")
+# ... and of lines that take a TinyG planner buffer (synchronised dwell and M-codes)
+PLANNED = MOTION + ("G4", "M3", "M4", "M5", "M7", "M8", "M9")
+
+
+def _code(line: str) -> str:
+    """First G/M word of a G-code line, skipping an N line number"""
+    words = line.split()
+    if words and words[0].startswith("N"):
+        words = words[1:]
+    return words[0].upper() if words else ""
+
+
+def parse_ack(line: str) -> Tuple[bool, Optional[str]]:
+    """
+    (is_ack, error) for one TinyG output line: the text-mode "tinyg [mm] ok>"
+    or "err" prompt, or a JSON {"r":...} reply whose footer status is non-zero.
+    """
+    if line.startswith("{"):
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            return False, None
+        if not isinstance(msg, dict) or "r" not in msg:
+            return False, None
+        # footer "f": [revision, status, rx_buffer, ...]; non-zero status is an error
+        footer = msg.get("f") or []
+        status = footer[1] if len(footer) > 1 else 0
+        return True, line if status else None
+    is_err = line.startswith("tinyg [") and "err" in line
+    return line.endswith("ok>") or is_err, line if is_err else None
+
+
+def is_report(line: str) -> bool:
+    """Asynchronous JSON report lines: status {"sr"}, queue {"qr"}, exception {"er"}"""
+    return line.startswith(('{"sr"', '{"qr"', '{"er"'))
+
+
+def response_error(lines) -> Optional[str]:
+    """First error among a command's response lines, see parse_ack"""
+    for line in lines or []:
+        error = parse_ack(line)[1]
+        if error:
+            return error
+    return None
+
+
+def reply_value(lines, key: str):
+    """Value of key in a JSON reply {"r":{key:...}} among lines, e.g. {"qr":n} -> free buffers"""
+    for line in lines or []:
+        if not line.startswith('{"r"'):
+            continue
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        body = msg.get("r") if isinstance(msg, dict) else None
+        if isinstance(body, dict) and key in body:
+            return body[key]
+    return None
+
+
+def reply_report(lines) -> Optional[dict]:
+    """The full status of a JSON reply to a {"sr":n} query, {"r":{"sr":{...}}}, if present"""
+    sr = reply_value(lines, "sr")
+    return sr if isinstance(sr, dict) else None
+
+
+# Commands that switch the TinyG to JSON mode with filtered automatic status reports
+STATUS_REPORT_SETUP = [
+    '{"ej":1}',
+    '{"sr":{"line":t,"posx":t,"posy":t,"posz":t,"posa":t,"feed":t,"vel":t,"stat":t}}',
+    '{"sv":1}',
+]
+
+# TinyG "stat" codes in status reports
+MACHINE_STATES = {
+    0: "Initializing", 1: "Ready", 2: "Alarm", 3: "Stop", 4: "End",
+    5: "Run", 6: "Hold", 7: "Probe", 8: "Cycle", 9: "Homing",
+}
+
+# States in which no motion is running or queued
+IDLE_STATES = {"Ready", "Stop", "End"}
+
+
+class TinyGStreamer:
+    """
+    Keeps the TinyG planner fed without fixed sleeps.
+
+    A reader thread owns the serial input: every acknowledgement ("ok>" prompt
+    in text mode, {"r":...} in JSON mode) completes the oldest outstanding
+    Command, so responses are matched to commands in order. Writers may have
+    at most max_outstanding unacknowledged lines in flight, and when queue
+    reports ($qv) are on they also hold back while fewer than low_water
+    planner buffers are free.
+    """
+
+    PLANNER_BUFFERS = 28
+
+    def __init__(self, serial_port, max_outstanding: int = 4, low_water: int = 4,
+                 on_report: Callable[[dict], None] = None):
+        self.serial = serial_port
+        self.max_outstanding = max_outstanding
+        self.low_water = low_water
+        self.on_report = on_report
+        self.queue_free = None  # free planner buffers from the last {"qr":n}, None if unknown
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._reader = None
+        self._running = False
+        self._count = 0
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def start(self, queue_reports: bool = True):
+        if self._running:
+            return self
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, name="tinyg-reader", daemon=True)
+        self._reader.start()
+        if queue_reports:
+            self.send("$qv=1")
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._reader is not None:
+            self._reader.join(timeout=2)
+        with self._cond:
+            while self._pending:
+                cmd = self._pending.popleft()
+                cmd.error = "streamer stopped"
+                cmd.done.set()
+            self._cond.notify_all()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def outstanding(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    # ------------------------------------------------------------------
+    # writing
+    # ------------------------------------------------------------------
+    def _window_open(self) -> bool:
+        if len(self._pending) >= self.max_outstanding:
+            return False
+        return self.queue_free is None or self.queue_free > self.low_water
+
+    def submit(self, line: str, timeout: float = None) -> Command:
+        """Send a line as soon as flow control allows; returns without waiting for the ack"""
+        line = line.strip()
+        if line in REALTIME:
+            raise ValueError(f"'{line}' is a realtime command, use write_realtime()")
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._window_open() or not self._running, timeout):
+                raise TimeoutError(f"TinyG planner stayed full for {timeout}s")
+            if not self._running:
+                raise RuntimeError("TinyG streamer is not running")
+            self._count += 1
+            cmd = Command(line, self._count)
+            self._pending.append(cmd)
+            cmd.sent_at = time.monotonic()
+            # queue_free drops as soon as we send a planned line; the next {"qr"} corrects it
+            if self.queue_free is not None and _code(line) in PLANNED:
+                self.queue_free -= 1
+            with self._write_lock:
+                self.serial.write((line + "\n").encode())
+        return cmd
+
+    def send(self, line: str, timeout: float = 10.0) -> List[str]:
+        """Send a line and wait for its matched response lines"""
+        return self.submit(line, timeout).wait(timeout)
+
+    def stream(self, lines, timeout: float = 30.0,
+               on_progress: Callable[[int, Command], None] = None) -> List[Command]:
+        """
+        Stream lines in order under flow control and wait until all are acknowledged.
+        on_progress(i, cmd) is called as each line is acknowledged.
+        """
+        commands = []
+        reported = 0
+        for line in lines:
+            commands.append(self.submit(line, timeout))
+            while on_progress and reported < len(commands) and commands[reported].done.is_set():
+                on_progress(reported, commands[reported])
+                reported += 1
+        for i in range(reported, len(commands)):
+            commands[i].wait(timeout)
+            if on_progress:
+                on_progress(i, commands[i])
+        return commands
+
+    def write_realtime(self, char: str):
+        """Feed hold (!), cycle start (~), queue flush (%), reset (ctrl-x): bypass flow control"""
+        with self._write_lock:
+            self.serial.write(char.encode())
+        if char in ("%", "\x18"):
+            # TinyG drops everything queued; nothing outstanding will be acknowledged
+            with self._cond:
+                while self._pending:
+                    cmd = self._pending.popleft()
+                    cmd.error = "flushed"
+                    cmd.done.set()
+                if self.queue_free is not None:
+                    self.queue_free = self.PLANNER_BUFFERS
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Wait until every sent line has been acknowledged"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending, timeout)
+
+    # ------------------------------------------------------------------
+    # reading
+    # ------------------------------------------------------------------
+    def _read_loop(self):
+        while self._running:
+            try:
+                raw = self.serial.readline()
+            except Exception as e:
+                logging.error(f"TinyG reader stopped: {e}")
+                self._running = False
+                break
+            if not raw:
+                continue
+            line = raw.decode(errors="ignore").strip()
+            if line:
+                self._dispatch(line)
+        with self._cond:
+            self._cond.notify_all()
+
+    def _dispatch(self, line: str):
+        if line.startswith("{"):
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                msg = None
+            if isinstance(msg, dict):
+                self._dispatch_json(line, msg)
+                return
+        # text mode: the prompt closes the command, any other line is output belonging to it
+        ack, error = parse_ack(line)
+        self._attach(line, ack=ack, error=error)
+
+    def _set_queue_free(self, free: int):
+        """
+        A {"qr"} count predates the planned lines still awaiting their ack (sent since, or
+        not yet parsed); without subtracting them a late report would reopen a full planner.
+        """
+        with self._cond:
+            self.queue_free = free - sum(1 for cmd in self._pending if _code(cmd.line) in PLANNED)
+            self._cond.notify_all()
+
+    def _dispatch_json(self, line: str, msg: dict):
+        if "qr" in msg:
+            self._set_queue_free(msg["qr"])
+        if "r" in msg:
+            _, error = parse_ack(line)
+            self._attach(line, ack=True, error=error)
+            reply = msg["r"]
+            # a {"sr":n} reply stays with its command: it is not a baseline for pushed deltas
+            if isinstance(reply, dict) and "qr" in reply:
+                self._set_queue_free(reply["qr"])
+        elif self.on_report is not None:
+            # asynchronous reports: {"sr":...}, {"qr":...}, {"er":...}
+            try:
+                self.on_report(msg)
+            except Exception as e:
+                logging.error(f"TinyG report handler failed: {e}")
+
+    def _attach(self, line: str, ack: bool, error: str = None):
+        with self._cond:
+            cmd = self._pending[0] if self._pending else None
+            if cmd is None:
+                logging.debug(f"TinyG unsolicited: {line}")
+                return
+            cmd.response.append(line)
+            if error:
+                cmd.error = error
+            if ack:
+                self._pending.popleft()
+                cmd.acked_at = time.monotonic()
+                cmd.done.set()
+                self._cond.notify_all()
@@ -78,6 +78,27 @@ def get_parts():
     return app.state.factory.parts
 
 
+class UpdatePartRequest(BaseModel):
+    part: dict
+
+
+@app.post("/update_part")
+async def update_part(req: UpdatePartRequest):
+    """Add, place or move a part; recently planned routes are replanned around it"""
+    replanned = await asyncio.to_thread(app.state.factory.update_part, req.part)
+    return {"status": "ok", "part_id": req.part.get("id"), "replanned": replanned}
+
+
+class DeletePartRequest(BaseModel):
+    part_id: str
+
+
+@app.post("/delete_part")
+async def delete_part(req: DeletePartRequest):
+    deleted = await asyncio.to_thread(app.state.factory.delete_part, req.part_id)
+    return {"status": "ok", "deleted": deleted}
+
+
 @app.get("/get_machines")
 def get_machines():
     """Return all machines as a dict: machineId -> machine"""
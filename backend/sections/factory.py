@@ -1,5 +1,6 @@
-from typing import List, Dict
-from aabb import AABB, plan_path
+from typing import List, Dict, Tuple
+from aabb import AABB, ObstacleIndex, PlanCache, plan_many, plan_path, segment_clear_3d
+from collections import OrderedDict
 import logging
 import json
 from machines.gantry import Gantry
@@ -8,7 +9,11 @@ from machines.gripper import ST3020Gripper
 from machines.arduino import Arduino
 from .jobs import JobsManager
 from .parts import PartsManager
+from . import gcode, job_order, kinematics, program
+import asyncio
+import math
 import os
+import threading
 
 
 class Factory:
@@ -17,12 +22,26 @@ class Factory:
     Provides methods to add them to the factory
     """
 
+    # planner settings shared by plot_path and the batch planner
+    PLAN_PARAMS = dict(safe_z=60, step=10, radius=5, engine="grid", smooth=True)
+    # interactive plot_path: best path found within max_time seconds per search
+    PLOT_PARAMS = dict(PLAN_PARAMS, engine="anytime", max_time=0.5)
+    # recent plot_path routes repaired after part edits, see replan_routes()
+    ROUTES = 32
+
     def __init__(self):
         self.machines = {'gantry': Gantry(), 'cobot280': Cobot280(), 'gripper': ST3020Gripper(), 'arduino': Arduino()}
         self.parts_manager = PartsManager()
         self.jobs_manager = JobsManager()
         self.tools: Dict[str, dict] = {}
         self.save_file = ""
+        # bumped by workspace_changed(); cached obstacles and plans belong to one version
+        self.workspace_version = 0
+        self._workspace_lock = threading.Lock()
+        self._obstacle_index = None
+        self._obstacle_key = None
+        self.plan_cache = PlanCache()
+        self._routes = OrderedDict()
     
     @property
     def jobs(self):
@@ -43,6 +62,8 @@ class Factory:
         self.machines['gantry'].holders = gantry['holders']
         self.machines['gantry'].locations = gantry['locations']
         self.machines['gantry'].toolend = gantry['toolend']
+        self.machines['gantry'].workspace = gantry.get('workspace')
+        self.machines['gantry'].limits = gantry.get('limits')
         self.machines['gantry'].set_position(**self.machines['gantry'].toolend['position'])
         self.tools = data.get("tools", {})
 
@@ -52,6 +73,7 @@ class Factory:
         # Load jobs
         parts_file = data.get("parts")
         self.parts_manager.load(parts_file)
+        self.workspace_changed()
         return self
 
     def save_factory(self):
@@ -65,7 +87,9 @@ class Factory:
                 'gantry': {
                     'toolend': self.machines['gantry'].toolend, 
                     'holders': self.machines['gantry'].holders,
-                    'locations': self.machines['gantry'].locations
+                    'locations': self.machines['gantry'].locations,
+                    'workspace': self.machines['gantry'].workspace,
+                    'limits': self.machines['gantry'].limits,
                     },
                 'cobot280': {'pose': self.machines['cobot280'].pose},
                 'gripper': {},
@@ -80,21 +104,226 @@ class Factory:
         logging.debug(f"Saved Factory, toolend {self.machines['gantry'].toolend}")
 
 
+    def obstacles(self) -> List[AABB]:
+        """AABB obstacles from the parts bboxes"""
+        return [AABB.from_bbox(part['bbox']) for part in self.parts.values() if part.get('bbox')]
+
+    def obstacle_index(self, radius: float = 0.0) -> ObstacleIndex:
+        """Shared obstacle index, rebuilt only when the workspace version or radius change"""
+        key = (radius, self.workspace_version)
+        if self._obstacle_index is None or self._obstacle_key != key:
+            self._obstacle_index = ObstacleIndex(self.obstacles(), radius=radius)
+            self._obstacle_key = key
+        return self._obstacle_index
+
+    def workspace_changed(self):
+        """Call after editing part bboxes or gantry locations: cached obstacles and plans go stale"""
+        with self._workspace_lock:
+            self.workspace_version += 1
+
+    def workspace_key(self) -> int:
+        """Fingerprint of everything a planned path depends on, see workspace_changed()"""
+        return self.workspace_version
+
     def plot_path(self, machine, target_part):
         workspace = machine['bounds']  # ((0, 300), (0, 200))  # XY bounds
-
-        obstacles = []
-        for part in self.parts.values():
-            aabb = AABB(part['bounds'])  # (50, 40, 0, 120, 160, 40)
-            obstacles.append(aabb)
-        
         start = machine['location']  # (10, 10, 0)
         goal = target_part['location']  # (260, 150, 5)
-        path = plan_path(start, goal, obstacles, workspace, safe_z=60, step=10, radius=5)
-        print("Planned path:")
-        for p in path:
-            print(p)
-        pass
+        params = self.PLOT_PARAMS
+
+        version = self.workspace_key()
+        self.plan_cache.sync(version)
+        key = self.plan_cache.key(start, goal, workspace=tuple(map(tuple, workspace)), **params)
+        path = self.plan_cache.get(key)
+        if path is None:
+            obstacles = self.obstacle_index(radius=params['radius'])
+            path = plan_path(start, goal, obstacles, workspace, **params)
+            self.plan_cache.put(key, path, version)
+        with self._workspace_lock:
+            self._routes[key] = (start, goal, workspace)
+            self._routes.move_to_end(key)
+            while len(self._routes) > self.ROUTES:
+                self._routes.popitem(last=False)
+        logging.debug(f"Planned path: {path}")
+        return path
+
+    def replan_routes(self) -> int:
+        """
+        Replan the recent plot_path routes for the current parts with the incremental
+        engine, which keeps each route's search and re-expands only the cells changed
+        bboxes touch, so the next plot_path of a route is a cache lookup.
+        Returns the number of routes replanned.
+        """
+        version = self.workspace_key()
+        self.plan_cache.sync(version)
+        params = dict(self.PLAN_PARAMS, engine="incremental")
+        obstacles = self.obstacle_index(radius=params['radius'])
+        with self._workspace_lock:
+            routes = list(self._routes.items())
+        replanned = 0
+        for key, (start, goal, workspace) in routes:
+            try:
+                path = plan_path(start, goal, obstacles, workspace, **params)
+            except RuntimeError:
+                continue  # no path any more; plot_path will report it
+            self.plan_cache.put(key, path, version)
+            replanned += 1
+        return replanned
+
+    def plan_batch(self, pairs: Dict[str, tuple], workspace, max_workers: int = None) -> Dict[str, list]:
+        """
+        Plan many {job_id: (start, goal)} moves across a process pool.
+        Results also fill plan_cache, so later plot_path calls are lookups.
+        """
+        params = self.PLAN_PARAMS
+        version = self.workspace_key()
+        self.plan_cache.sync(version)
+        ws = tuple(map(tuple, workspace))
+        plans, todo = {}, {}
+        for job_id, (start, goal) in pairs.items():
+            path = self.plan_cache.get(self.plan_cache.key(start, goal, workspace=ws, **params))
+            if path is None:
+                todo[job_id] = (start, goal)
+            else:
+                plans[job_id] = path
+
+        results = plan_many(todo, self.obstacles(), workspace, max_workers=max_workers, **params)
+        for job_id, path in results.items():
+            if path is None:
+                logging.warning(f'plan_batch: no path for job "{job_id}"')
+                continue
+            start, goal = todo[job_id]
+            self.plan_cache.put(self.plan_cache.key(start, goal, workspace=ws, **params), path, version)
+        plans.update(results)
+        return plans
+
+    def plan_jobs(self, workspace, max_workers: int = None) -> Dict[str, list]:
+        """Pre-plan every gantry goto/step job, following the gantry position through the job list"""
+        moves = self._job_moves(self.machines['gantry'].toolend['position'])
+        return self.plan_batch(moves, workspace, max_workers=max_workers)
+
+    def validate_trajectory(self, waypoints: List[dict], check_collisions: bool = True) -> List[str]:
+        """
+        Problems with a gantry trajectory: waypoints outside the gantry workspace and,
+        optionally, legs (from the current toolend position) passing through parts,
+        inflated by the planner radius. On a part a leg starts or ends on as a pick/place
+        target (see _pick_target) only the part's body counts, not the radius margin.
+        """
+        gantry = self.machines['gantry']
+        errors = []
+        if gantry.workspace:
+            for i, wp in enumerate(waypoints):
+                for axis, (lo, hi) in zip("xyz", gantry.workspace):
+                    if not lo <= wp[axis] <= hi:
+                        errors.append(f"waypoint {i}: {axis}={wp[axis]} outside [{lo}, {hi}]")
+        if check_collisions:
+            radius = self.PLAN_PARAMS['radius']
+            position = (gantry.toolend or {}).get('position')
+            points = [(position['x'], position['y'], position['z'])] if position else []
+            points += [(wp['x'], wp['y'], wp['z']) for wp in waypoints]
+            obstacles = self.obstacles()
+            for i, (a, b) in enumerate(zip(points, points[1:])):
+                others, targets = [], []
+                for obs in obstacles:
+                    if not (self._pick_target(obs, a, radius) or self._pick_target(obs, b, radius)):
+                        others.append(obs)
+                    elif not math.isinf(obs.zmax):
+                        # the part body itself still counts; reaching its top does not
+                        targets.append(AABB(obs.xmin, obs.ymin, obs.zmin, obs.xmax, obs.ymax, obs.zmax - 1e-6))
+                if not (segment_clear_3d(a, b, others, radius) and segment_clear_3d(a, b, targets)):
+                    errors.append(f"segment {i if position else i + 1} collides with a part")
+        return errors
+
+    @staticmethod
+    def _pick_target(obs: AABB, point, radius: float) -> bool:
+        """
+        point is a pick/place target on the part: over its footprint (inflated by radius)
+        and, when its height is known, not below its top. A footprint-only part has no
+        known top, so a leg to or from a target on it is not checked against it.
+        """
+        return obs.contains_xy(point[0], point[1], radius) and (math.isinf(obs.zmax) or point[2] >= obs.zmax)
+
+    def plan_feedrates(self, points) -> List[float]:
+        """Per-segment F for waypoints (start included), from clearance to the parts and gantry limits"""
+        limits = kinematics.Limits(self.machines['gantry'].limits)
+        return kinematics.feedrates(points, self.obstacles(), limits, radius=self.PLAN_PARAMS['radius'])
+
+    def compile_path(self, points, speed, tolerance: float = 0.5) -> List[str]:
+        """G-code for waypoints (start included) with corners rounded into arcs clear of the parts"""
+        return gcode.compile_path(points, speed, tolerance, self.obstacles(), radius=self.PLAN_PARAMS['radius'])
+
+    def estimate_jobs(self, profile: str = "scurve", planned: bool = False,
+                      optimize_feed: bool = False) -> dict:
+        """
+        Predicted per-job and total gantry times from the kinematic model.
+        planned=True times the plan_path route of each goto/step (needs gantry.workspace)
+        instead of the straight move; optimize_feed=True runs each segment at its
+        plan_feedrates value instead of the job speed.
+        """
+        gantry = self.machines['gantry']
+        limits = kinematics.Limits(gantry.limits, profile)
+        position = (gantry.toolend or {}).get('position') or {}
+        paths = feeds = None
+        if planned:
+            if not gantry.workspace:
+                raise ValueError("planned estimate needs the gantry workspace")
+            paths = self.plan_jobs(gantry.workspace[:2])
+            if optimize_feed:
+                moves = self._job_moves(position)
+                feeds = {job_id: self.plan_feedrates([moves[job_id][0]] + list(path))
+                         for job_id, path in paths.items() if path}
+        return kinematics.estimate_jobs(self.jobs, position, limits, gantry.locations, paths, feeds)
+
+    def _job_moves(self, position) -> Dict[str, Tuple[tuple, tuple]]:
+        """Start and end XYZ of each goto/step job, following the gantry through the job list"""
+        locations = self.machines['gantry'].locations
+        current = {axis: float(position.get(axis, 0.0)) for axis in kinematics.AXES}
+        moves = {}
+        for job_id, job in self.jobs.items():
+            if job.get('machine') != 'gantry' or job.get('action') not in ('goto', 'step'):
+                continue
+            target = kinematics.job_target(job, current, locations)
+            moves[job_id] = tuple(tuple(p[axis] for axis in "xyz") for p in (current, target))
+            current = target
+        return moves
+
+    def estimate_path(self, points, speed, profile: str = "scurve") -> dict:
+        """Predicted time for waypoints (e.g. plot_path output) run as G1 moves at speed"""
+        limits = kinematics.Limits(self.machines['gantry'].limits, profile)
+        return kinematics.estimate_path(points, speed, limits)
+
+    def optimize_jobs(self, apply: bool = False) -> dict:
+        """
+        Propose a job order that groups work per effector and shortens gantry travel,
+        with estimated times before and after. apply=True rewrites the jobs list in that
+        order; attach/detach jobs move with the tool changes (see job_order.optimize).
+        """
+        gantry = self.machines['gantry']
+        toolend = gantry.toolend or {}
+        position = toolend.get('position') or {}
+        start_xy = (position['x'], position['y']) if position else None
+        holders = gantry.effector_holders()
+        result = job_order.optimize(self.jobs, gantry.locations, start_xy, toolend.get('effector', ""), holders)
+        logging.info(f"optimize_jobs: {result['before']['total_s']}s -> {result['after']['total_s']}s")
+        if apply:
+            self.jobs_manager.reorder(result['order'], result['tool_changes'], holders)
+            self.save_factory()
+        return result
+
+    def update_part(self, part) -> int:
+        """Add or replace a part (placed, moved); returns the number of routes replanned"""
+        self.parts_manager.parts[part['id']] = part
+        self.workspace_changed()
+        logging.info(f'update_part: "{part["id"]}"')
+        return self.replan_routes()
+
+    def delete_part(self, part_id) -> bool:
+        if self.parts_manager.parts.pop(part_id, None) is None:
+            return False
+        self.workspace_changed()
+        logging.info(f'delete_part: "{part_id}"')
+        self.replan_routes()
+        return True
 
     def add_job(self):
         new_id = self.jobs_manager.add_job()
@@ -121,6 +350,47 @@ class Factory:
         self.save_factory()
         logging.info(f'run_job: "{job_id}"')
     
+    def compile_program(self, force: bool = False) -> str:
+        """
+        Compile the jobs into a gantry program next to the jobs file; reused while
+        the jobs and gantry locations are unchanged.
+        """
+        if not self.jobs_manager.jobs_file:
+            raise RuntimeError("Jobs file not set")
+        path = program.program_path(self.jobs_manager.jobs_file)
+        locations = self.machines['gantry'].locations
+        digest = program.source_hash(self.jobs, locations)
+        if force or program.read_digest(path) != digest:
+            program.write_program(path, program.compile_jobs(self.jobs, locations), digest)
+            logging.info(f"compile_program: wrote {path}")
+        return path
+
+    def run_program(self, timeout: float = 30.0) -> dict:
+        """Run every job from the compiled program: gantry G-code streamed, other jobs at sync markers"""
+        path = self.compile_program()
+        with program.ProgramFile(path) as prog:
+            result = program.run(prog, self.machines['gantry'], self._run_synced_job, timeout)
+        self.save_factory()
+        logging.info(f"run_program: {result}")
+        return {"program": path, **result}
+
+    def _run_synced_job(self, job_id):
+        job = self.jobs[job_id]
+        machine = self.machines.get(job['machine'])
+        method = getattr(machine, job['action'], None) if machine else None
+        if not method:
+            logging.warning(f"run_program: no {job['machine']}.{job['action']} for job {job_id}")
+            return
+        params = job.get('params')
+        if isinstance(params, dict):
+            result = method(**params)
+        elif params is None:
+            result = method()
+        else:
+            result = method(params)
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
+
     def run_script(self, path):
         self.jobs_manager.run_script(path)
         self.save_factory()
@@ -0,0 +1,143 @@
+import math
+from typing import List, Sequence
+
+from aabb import segment_clear_3d
+
+
+def _fmt(value: float) -> str:
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _collinear(p0, p1, p2, eps=1e-6) -> bool:
+    d1 = [b - a for a, b in zip(p0, p1)]
+    d2 = [b - a for a, b in zip(p1, p2)]
+    cross = (d1[1] * d2[2] - d1[2] * d2[1], d1[2] * d2[0] - d1[0] * d2[2], d1[0] * d2[1] - d1[1] * d2[0])
+    return math.hypot(*cross) <= eps * max(math.hypot(*d1) * math.hypot(*d2), eps) and \
+        sum(a * b for a, b in zip(d1, d2)) > 0
+
+
+def _fillet(p0, p1, p2, tolerance: float):
+    """
+    Tangent arc replacing the XY corner at p1, deviating at most tolerance from it.
+    Returns (start, end, center, ccw) or None when the corner cannot be rounded.
+    """
+    if not (p0[2] == p1[2] == p2[2]):
+        return None  # G17 arcs only round corners of level XY travel
+    d1 = (p1[0] - p0[0], p1[1] - p0[1])
+    d2 = (p2[0] - p1[0], p2[1] - p1[1])
+    l1, l2 = math.hypot(*d1), math.hypot(*d2)
+    if l1 < 1e-9 or l2 < 1e-9:
+        return None
+    u1 = (d1[0] / l1, d1[1] / l1)
+    u2 = (d2[0] / l2, d2[1] / l2)
+    cos_turn = max(-1.0, min(1.0, u1[0] * u2[0] + u1[1] * u2[1]))
+    turn = math.acos(cos_turn)
+    if turn < 1e-3 or turn > math.pi - 1e-3:
+        return None
+    half = (math.pi - turn) / 2.0          # half of the interior angle
+    sin_half = math.sin(half)
+    radius = tolerance * sin_half / (1.0 - sin_half)
+    # the arc's tangent points may use at most half of each neighbouring segment
+    radius = min(radius, min(l1, l2) / 2.0 * math.tan(half))
+    tangent = radius / math.tan(half)
+    start = (p1[0] - u1[0] * tangent, p1[1] - u1[1] * tangent, p1[2])
+    end = (p1[0] + u2[0] * tangent, p1[1] + u2[1] * tangent, p1[2])
+    ccw = u1[0] * u2[1] - u1[1] * u2[0] > 0
+    normal = (-u1[1], u1[0]) if ccw else (u1[1], -u1[0])
+    center = (start[0] + normal[0] * radius, start[1] + normal[1] * radius)
+    return start, end, center, ccw
+
+
+def _arc_points(start, end, center, ccw, pieces: int = 8):
+    a0 = math.atan2(start[1] - center[1], start[0] - center[0])
+    a1 = math.atan2(end[1] - center[1], end[0] - center[0])
+    sweep = (a1 - a0) % (2 * math.pi) if ccw else -((a0 - a1) % (2 * math.pi))
+    r = math.hypot(start[0] - center[0], start[1] - center[1])
+    return [(center[0] + r * math.cos(a0 + sweep * k / pieces),
+             center[1] + r * math.sin(a0 + sweep * k / pieces), start[2]) for k in range(pieces + 1)]
+
+
+def _arc_clear(arc, obstacles, radius: float) -> bool:
+    points = _arc_points(*arc)
+    return all(segment_clear_3d(a, b, obstacles, radius) for a, b in zip(points, points[1:]))
+
+
+def compile_path(points: Sequence[Sequence[float]], speed, tolerance: float = 0.5,
+                 obstacles=None, radius: float = 0.0) -> List[str]:
+    """
+    G-code program for a polyline (plan_path output with its start point first).
+    Collinear waypoints are merged and every level XY corner is replaced by a
+    tangent G2/G3 arc deviating at most tolerance (mm) from the corner, so the
+    controller keeps velocity through the turn. With obstacles, an arc that
+    would cut into a box inflated by radius is shrunk, then left as a corner.
+    Points may carry A as a fourth value: waypoints where A changes are never
+    merged and corners rotating A stay G1 corners.
+    speed: F in mm/min, or one per segment (an arc takes the lower of its two).
+    Axis words and F are only written when they change.
+    """
+    rotary = any(len(p) > 3 for p in points)
+    filled, a = [], 0.0
+    for p in points:
+        a = float(p[3]) if len(p) > 3 else a
+        filled.append(tuple(float(v) for v in p[:3]) + (a,))
+    points = filled
+    speeds = list(speed) if isinstance(speed, (list, tuple)) else [speed] * max(len(points) - 1, 0)
+    if len(points) < 2:
+        return []
+
+    # merge collinear waypoints, keeping the lower feed of merged segments
+    kept, feeds = [points[0], points[1]], [speeds[0]]
+    for p, feed in zip(points[2:], speeds[1:]):
+        if kept[-2][3] == kept[-1][3] == p[3] and _collinear(kept[-2][:3], kept[-1][:3], p[:3]):
+            kept[-1] = p
+            feeds[-1] = min(feeds[-1], feed)
+        elif p != kept[-1]:
+            kept.append(p)
+            feeds.append(feed)
+
+    # (kind, end, center, feed) moves; a fillet shortens both neighbouring lines
+    moves = []
+    cursor = kept[0]
+    for i in range(1, len(kept)):
+        end, feed = kept[i], feeds[i - 1]
+        arc = None
+        if i < len(kept) - 1 and tolerance > 0 and cursor[3] == end[3] == kept[i + 1][3]:
+            tol = tolerance
+            while tol > 0.01 and arc is None:
+                arc = _fillet(cursor[:3], end[:3], kept[i + 1][:3], tol)
+                if arc is None:
+                    break
+                if obstacles and not _arc_clear(arc, obstacles, radius):
+                    arc, tol = None, tol / 2.0
+        if arc is None:
+            moves.append(("G1", end, None, feed))
+            cursor = end
+            continue
+        start, arc_end, center, ccw = arc
+        start, arc_end = start + (end[3],), arc_end + (end[3],)
+        moves.append(("G1", start, None, feed))
+        moves.append(("G3" if ccw else "G2", arc_end, (center[0] - start[0], center[1] - start[1]),
+                      min(feed, feeds[i])))
+        cursor = arc_end
+        kept[i] = arc_end  # the next line starts where the arc ends
+
+    lines = ["G90", "G17"]
+    axes = "XYZA" if rotary else "XYZ"
+    last = dict(zip("XYZA", kept[0]))
+    last_feed = None
+    for kind, end, offset, feed in moves:
+        words = [kind]
+        for axis, value in zip(axes, end):
+            if (offset is not None and axis != "A") or abs(value - last[axis]) > 1e-9:
+                words.append(f"{axis}{_fmt(value)}")
+            last[axis] = value
+        if offset is not None:
+            words += [f"I{_fmt(offset[0])}", f"J{_fmt(offset[1])}"]
+        elif len(words) == 1:
+            continue  # zero-length line
+        if feed != last_feed:
+            words.append(f"F{_fmt(feed)}")
+            last_feed = feed
+        lines.append(" ".join(words))
+    return lines
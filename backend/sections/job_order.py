@@ -0,0 +1,222 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from .kinematics import ATTACH_S, DEFAULT_SPEED, TOOL_CHANGE_S, UNKNOWN, job_target
+
+
+class Task:
+    """
+    A gantry goto plus the jobs that follow it until the next goto (steps,
+    gripper/cobot/screwdriver actions). Tasks are reordered as a unit.
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.job_ids: List[str] = []
+        self.xy: Optional[Tuple[float, float]] = None
+        self.speed = DEFAULT_SPEED
+        self.effector = ""
+        self.after = set()  # indices of tasks that must run before this one
+
+    def __repr__(self):
+        return f"Task({self.index}, jobs={self.job_ids}, xy={self.xy}, effector={self.effector!r})"
+
+
+def _attached(params: dict, holders=None) -> str:
+    """Effector an attach job puts on the toolend: its target holder's, when holders ({effector: holder}) know it"""
+    target = params.get("target", "")
+    for effector, holder in (holders or {}).items():
+        if holder == target:
+            return effector
+    return target
+
+
+def build_tasks(jobs: Dict[str, dict], locations=None, holders=None) -> Tuple[List[Task], List[str]]:
+    """
+    Split jobs (in their current order) into tasks.
+    Attach/detach jobs are not part of any task: they only set the effector
+    used by later jobs and are returned separately, for optimize to place again.
+    """
+    tasks: List[Task] = []
+    tool_jobs: List[str] = []
+    effector = ""
+    task_of = {}
+    for job_id, job in jobs.items():
+        action = job.get("action")
+        params = job.get("params") if isinstance(job.get("params"), dict) else {}
+        if job.get("machine") == "gantry" and action in ("attach", "detach"):
+            effector = _attached(params, holders) if action == "attach" else ""
+            tool_jobs.append(job_id)
+            continue
+        starts_task = job.get("machine") == "gantry" and action == "goto"
+        if starts_task or not tasks:
+            tasks.append(Task(len(tasks)))
+        task = tasks[-1]
+        if starts_task:
+            target = job_target(job, UNKNOWN, locations)
+            if not (math.isnan(target["x"]) or math.isnan(target["y"])):
+                task.xy = (target["x"], target["y"])
+            task.speed = params.get("speed") or DEFAULT_SPEED
+            task.effector = job.get("effector", effector)
+        elif job.get("effector"):
+            task.effector = job["effector"]
+        task.job_ids.append(job_id)
+        task_of[str(job_id)] = task.index
+
+    for task in tasks:
+        for job_id in task.job_ids:
+            for dep in jobs[job_id].get("depends_on") or []:
+                dep_task = task_of.get(str(dep))
+                if dep_task is not None and dep_task != task.index:
+                    task.after.add(dep_task)
+    # a task with no goto position depends on where the previous task left the gantry;
+    # leading jobs before the first goto stay first
+    for task in tasks[1:]:
+        if task.xy is None:
+            task.after.add(task.index - 1)
+        if tasks[0].xy is None:
+            task.after.add(0)
+    return tasks, tool_jobs
+
+
+def _travel_s(a, b, speed) -> float:
+    if a is None or b is None:
+        return 0.0
+    return math.dist(a, b) / (speed / 60.0)
+
+
+def estimate(tasks: List[Task], order: List[int], start_xy=None, start_effector="") -> dict:
+    """Estimated travel and tool-change time for running tasks in order"""
+    travel = changes = 0.0
+    tool_s = 0.0
+    xy, effector = start_xy, start_effector
+    for i in order:
+        task = tasks[i]
+        if task.effector and task.effector != effector:
+            tool_s += TOOL_CHANGE_S if effector else ATTACH_S
+            changes += 1
+            effector = task.effector
+        travel += _travel_s(xy, task.xy, task.speed)
+        if task.xy is not None:
+            xy = task.xy
+    return {
+        "travel_s": round(travel, 2),
+        "tool_changes": int(changes),
+        "tool_change_s": round(tool_s, 2),
+        "total_s": round(travel + tool_s, 2),
+    }
+
+
+def _nearest_neighbour(tasks: List[Task], start_xy, start_effector) -> List[int]:
+    """Greedy order: cheapest ready task next, where switching effector costs a tool change"""
+    done = set()
+    order = []
+    xy, effector = start_xy, start_effector
+    while len(order) < len(tasks):
+        ready = [t for t in tasks if t.index not in done and t.after <= done]
+        if not ready:
+            raise ValueError("Job dependencies contain a cycle")
+
+        def cost(t):
+            change = TOOL_CHANGE_S if t.effector and t.effector != effector else 0.0
+            return (change + _travel_s(xy, t.xy, t.speed), t.index)
+
+        task = min(ready, key=cost)
+        order.append(task.index)
+        done.add(task.index)
+        if task.effector:
+            effector = task.effector
+        if task.xy is not None:
+            xy = task.xy
+    return order
+
+
+def _two_opt(tasks: List[Task], order: List[int], start_xy, start_effector) -> List[int]:
+    """Reverse segments within same-effector runs while it shortens travel and keeps dependencies"""
+    best = estimate(tasks, order, start_xy, start_effector)["total_s"]
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                segment = order[i:j + 1]
+                if len({tasks[k].effector for k in segment if tasks[k].effector}) > 1:
+                    break
+                members = set(segment)
+                if any(tasks[k].after & members for k in segment):
+                    break
+                candidate = order[:i] + segment[::-1] + order[j + 1:]
+                total = estimate(tasks, candidate, start_xy, start_effector)["total_s"]
+                if total < best - 1e-9:
+                    order, best, improved = candidate, total, True
+    return order
+
+
+def _tool_jobs(jobs: Dict[str, dict], tool_jobs: List[str], start_effector="", holders=None):
+    """
+    Attach job per effector, the detach job putting each effector away and whether
+    the job list leaves the toolend empty, from the attach/detach jobs in list order
+    """
+    attaches, detaches = {}, {}
+    effector = start_effector
+    for job_id in tool_jobs:
+        params = jobs[job_id].get("params") if isinstance(jobs[job_id].get("params"), dict) else {}
+        if jobs[job_id].get("action") == "attach":
+            effector = _attached(params, holders)
+            attaches.setdefault(effector, job_id)
+        else:
+            if effector:
+                detaches.setdefault(effector, job_id)
+            effector = ""
+    ends_detached = bool(tool_jobs) and jobs[tool_jobs[-1]].get("action") == "detach"
+    return attaches, detaches, ends_detached
+
+
+def optimize(jobs: Dict[str, dict], locations=None, start_xy=None, start_effector="", holders=None) -> dict:
+    """
+    Reorder jobs so work for one effector is grouped and XY travel is short.
+    The original attach/detach jobs move with the tool changes: an effector's detach
+    runs before the switch away from it, and a list that ended detached still does.
+    Tool changes with no job left to reuse are returned to be generated.
+    holders ({effector: holder name}) lets attach jobs, which name a holder, and jobs
+    or a toolend naming the effector itself count as the same effector.
+    Returns {"order": [job ids], "tool_changes": [(position in order, effector or ""
+             for a detach)], "dropped": [attach/detach job ids], "before": {...}, "after": {...}}
+    """
+    tasks, tool_jobs = build_tasks(jobs, locations, holders)
+    attaches, detaches, ends_detached = _tool_jobs(jobs, tool_jobs, start_effector, holders)
+    original = list(range(len(tasks)))
+    order = _nearest_neighbour(tasks, start_xy, start_effector)
+    order = _two_opt(tasks, order, start_xy, start_effector)
+
+    job_order, tool_changes = [], []
+    kept = set()
+
+    def keep(job_id) -> bool:
+        if job_id is None or job_id in kept:
+            return False
+        kept.add(job_id)
+        job_order.append(job_id)
+        return True
+
+    effector = start_effector
+    for i in order:
+        task = tasks[i]
+        if task.effector and task.effector != effector:
+            if effector:
+                # attach would detach on its own, but into the first empty holder
+                keep(detaches.get(effector))
+            if not keep(attaches.get(task.effector)):
+                tool_changes.append((len(job_order), task.effector))
+            effector = task.effector
+        job_order.extend(task.job_ids)
+    if ends_detached and effector and not keep(detaches.get(effector)):
+        tool_changes.append((len(job_order), ""))
+
+    return {
+        "order": job_order,
+        "tool_changes": tool_changes,
+        "dropped": [job_id for job_id in tool_jobs if job_id not in kept],
+        "before": estimate(tasks, original, start_xy, start_effector),
+        "after": estimate(tasks, order, start_xy, start_effector),
+    }
@@ -81,6 +81,33 @@ class JobsManager:
         self.jobs[job["id"]] = job
         return job['id']
     
+    def reorder(self, order: list, tool_changes: list = (), holders: dict = None):
+        """
+        Rebuild jobs in the given order of job ids, inserting a gantry tool change job
+        at each (position, effector) in tool_changes: an attach of effector, or a detach
+        for "" (position len(order) puts it last). Jobs not in order are dropped.
+        holders maps effector -> holder name, the target Gantry.attach takes.
+        """
+        holders = holders or {}
+        changes = {}
+        for position, effector in tool_changes:
+            changes.setdefault(position, []).append(effector)
+        jobs = {}
+        for position, job_id in enumerate(list(order) + [None]):
+            for effector in changes.get(position, ()):
+                action = "attach" if effector else "detach"
+                tool_id = f"{'end' if job_id is None else job_id}_{action}"
+                jobs[tool_id] = {
+                    "id": tool_id,
+                    "machine": "gantry",
+                    "action": action,
+                    "params": {"target": holders.get(effector, effector)} if effector else {},
+                }
+            if job_id is not None:
+                jobs[job_id] = self.jobs[job_id]
+        self.jobs = jobs
+        return list(jobs)
+
     def delete_job(self, job_id: str) -> bool:
         if job_id in self.jobs:
             del self.jobs[job_id]
@@ -0,0 +1,293 @@
+import math
+from typing import Dict, List, Optional, Sequence
+
+from aabb import segment_clearance
+
+AXES = ("x", "y", "z", "a")
+# A position nothing is known about (see job_target)
+UNKNOWN = {axis: math.nan for axis in AXES}
+
+# Rough gantry timings (seconds, mm/min); job_order compares job orders with them too
+TOOL_CHANGE_S = 30.0    # detach + attach
+ATTACH_S = 15.0         # first attach from an empty toolend
+DEFAULT_SPEED = 2000.0
+
+# TinyG-style machine limits, in TinyG units:
+#   vm  maximum velocity (mm/min, deg/min for A)           $xvm
+#   jm  maximum jerk (x 1,000,000 mm/min^3)                 $xjm
+#   am  maximum acceleration (mm/s^2), trapezoid profile only
+#   jd  junction deviation (mm), ja junction acceleration (mm/min^2)
+DEFAULT_LIMITS = {
+    "x": {"vm": 16000, "jm": 5000, "am": 1500},
+    "y": {"vm": 16000, "jm": 5000, "am": 1500},
+    "z": {"vm": 1200, "jm": 50, "am": 300},
+    "a": {"vm": 36000, "jm": 20000, "am": 3000},
+    "jd": 0.05,
+    "ja": 2000000,
+}
+
+PROFILES = ("scurve", "trapezoid")
+
+# Feedrate planner (mm/min, mm): full speed only with free_clearance around the move;
+# "min" is the feed jobs have always used near jigs
+FEEDS = {"max": 8000, "min": 2000, "approach": 800, "free_clearance": 25.0}
+
+# Gantry actions that do not move along a straight line (seconds)
+ACTION_S = {
+    "attach": ATTACH_S,
+    "detach": TOOL_CHANGE_S - ATTACH_S,
+    "unlock": 1.0,
+}
+
+
+class Limits:
+    """Per-axis limits converted to mm/s units"""
+
+    def __init__(self, limits: dict = None, profile: str = "scurve"):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown motion profile: {profile}")
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.profile = profile
+        self.vmax = [limits[axis]["vm"] / 60.0 for axis in AXES]
+        if profile == "scurve":
+            # TinyG plans constant-jerk S-curves with no separate acceleration limit
+            self.jerk = [limits[axis]["jm"] * 1e6 / 60.0 ** 3 for axis in AXES]
+            self.accel = [math.inf] * len(AXES)
+        else:
+            self.jerk = [math.inf] * len(AXES)
+            self.accel = [limits[axis]["am"] for axis in AXES]
+        self.junction_deviation = limits["jd"]
+        self.junction_accel = limits["ja"] / 60.0 ** 2
+
+    def along(self, unit: Sequence[float]):
+        """(velocity, acceleration, jerk) limits for a move in direction unit"""
+        def scale(values):
+            return min((v / abs(u) for v, u in zip(values, unit) if abs(u) > 1e-12), default=math.inf)
+        return scale(self.vmax), scale(self.accel), scale(self.jerk)
+
+
+def _move_vector(p0, p1):
+    """(length, unit) like TinyG: length over XYZ, or |dA| for a rotation-only move"""
+    delta = [(b if b is not None else a) - a for a, b in zip(p0, p1)]
+    length = math.sqrt(sum(d * d for d in delta[:3]))
+    if length < 1e-9:
+        length = abs(delta[3]) if len(delta) > 3 else 0.0
+    if length < 1e-9:
+        return 0.0, [0.0] * len(delta)
+    return length, [d / length for d in delta]
+
+
+def ramp(v0: float, v1: float, accel: float, jerk: float):
+    """(time, distance) to change speed from v0 to v1 with a symmetric jerk-limited profile"""
+    dv = abs(v1 - v0)
+    if dv == 0:
+        return 0.0, 0.0
+    if math.isinf(jerk) and math.isinf(accel):
+        return 0.0, 0.0
+    if math.isinf(jerk):
+        t = dv / accel
+    elif math.isinf(accel) or dv <= accel * accel / jerk:
+        t = 2.0 * math.sqrt(dv / jerk)
+    else:
+        t = dv / accel + accel / jerk
+    return t, (v0 + v1) / 2.0 * t
+
+
+def _reachable(v0: float, length: float, vcap: float, accel: float, jerk: float) -> float:
+    """Highest speed reachable from v0 within length, capped at vcap"""
+    if ramp(v0, vcap, accel, jerk)[1] <= length:
+        return vcap
+    lo, hi = v0, vcap
+    for _ in range(50):
+        mid = (lo + hi) / 2.0
+        if ramp(v0, mid, accel, jerk)[1] <= length:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def move_time(length: float, v0: float, v1: float, vmax: float, accel: float, jerk: float):
+    """(time, peak velocity) for a move of length entered at v0 and left at v1"""
+    if length <= 0:
+        return 0.0, 0.0
+    t_up, d_up = ramp(v0, vmax, accel, jerk)
+    t_down, d_down = ramp(vmax, v1, accel, jerk)
+    if d_up + d_down <= length:
+        return t_up + t_down + (length - d_up - d_down) / vmax, vmax
+    # no cruise: find the peak where acceleration meets deceleration
+    lo, hi = max(v0, v1), vmax
+    for _ in range(50):
+        mid = (lo + hi) / 2.0
+        if ramp(v0, mid, accel, jerk)[1] + ramp(mid, v1, accel, jerk)[1] <= length:
+            lo = mid
+        else:
+            hi = mid
+    t_up, d_up = ramp(v0, lo, accel, jerk)
+    t_down, d_down = ramp(lo, v1, accel, jerk)
+    rest = length - d_up - d_down
+    if rest < 0 or lo <= 0:
+        # v0 -> v1 alone needs more than length; the planner passes should prevent this
+        return 2.0 * length / max(v0 + v1, 1e-9), lo
+    return t_up + t_down + rest / lo, lo
+
+
+def _junction_speed(u0, u1, limits: Limits) -> float:
+    """TinyG/grbl junction deviation: fastest speed through the corner between unit vectors u0, u1"""
+    cos_theta = -sum(a * b for a, b in zip(u0[:3], u1[:3]))
+    if cos_theta < -0.999999:
+        return math.inf  # straight on
+    if cos_theta > 0.999999:
+        return 0.0       # reversal
+    sin_half = math.sqrt((1.0 - cos_theta) / 2.0)
+    return math.sqrt(limits.junction_accel * limits.junction_deviation * sin_half / (1.0 - sin_half))
+
+
+def estimate_path(points: Sequence[Sequence[float]], speed, limits: Limits = None) -> dict:
+    """
+    Predicted time to run points as consecutive G1 moves, starting and ending at rest.
+    points: (x, y, z) or (x, y, z, a); speed: feedrate in mm/min, or one per segment.
+    Entry and exit speeds come from junction deviation and a backward/forward pass.
+    """
+    limits = limits or Limits()
+    points = [tuple(p) + (0.0,) * (4 - len(p)) for p in points]
+    speeds = list(speed) if isinstance(speed, (list, tuple)) else [speed] * max(len(points) - 1, 0)
+    moves = []
+    for (p0, p1), feed in zip(zip(points, points[1:]), speeds):
+        length, unit = _move_vector(p0, p1)
+        if length == 0:
+            continue
+        vmax, accel, jerk = limits.along(unit)
+        moves.append({"length": length, "unit": unit, "vmax": min(feed / 60.0, vmax),
+                      "accel": accel, "jerk": jerk})
+
+    # exit speed of move i = entry speed of move i + 1
+    n = len(moves)
+    exits = [0.0] * n
+    for i in range(n - 1):
+        exits[i] = min(moves[i]["vmax"], moves[i + 1]["vmax"],
+                       _junction_speed(moves[i]["unit"], moves[i + 1]["unit"], limits))
+    # backward pass: every move must be able to slow to its exit speed
+    for i in range(n - 1, 0, -1):
+        m = moves[i]
+        exits[i - 1] = min(exits[i - 1], _reachable(exits[i], m["length"], m["vmax"], m["accel"], m["jerk"]))
+    # forward pass: and to reach its exit speed from its entry speed
+    entry = 0.0
+    segments = []
+    total = 0.0
+    for i, m in enumerate(moves):
+        exits[i] = min(exits[i], _reachable(entry, m["length"], m["vmax"], m["accel"], m["jerk"]))
+        t, peak = move_time(m["length"], entry, exits[i], m["vmax"], m["accel"], m["jerk"])
+        segments.append({"length_mm": round(m["length"], 3), "time_s": round(t, 4),
+                         "entry_mm_min": round(entry * 60, 1), "peak_mm_min": round(peak * 60, 1)})
+        total += t
+        entry = exits[i]
+    return {
+        "time_s": round(total, 4),
+        "length_mm": round(sum(m["length"] for m in moves), 3),
+        "segments": segments,
+    }
+
+
+def feedrates(points: Sequence[Sequence[float]], obstacles, limits: Limits = None,
+              radius: float = 0.0, feeds: dict = None) -> List[float]:
+    """
+    Highest safe F (mm/min) for each segment of points. Feed scales from feeds["min"]
+    at contact to feeds["max"] at feeds["free_clearance"] from the nearest obstacle;
+    mainly-downward Z moves ending within free_clearance of an obstacle are approaches
+    at feeds["approach"]; the machine velocity limit along the segment caps everything.
+    """
+    limits = limits or Limits()
+    feeds = {**FEEDS, **(feeds or {})}
+    points = [tuple(p) + (0.0,) * (4 - len(p)) for p in points]
+    result = []
+    for p0, p1 in zip(points, points[1:]):
+        length, unit = _move_vector(p0, p1)
+        if length == 0:
+            result.append(feeds["min"])
+            continue
+        clearance = segment_clearance(p0[:3], p1[:3], obstacles, radius)
+        share = min(clearance / feeds["free_clearance"], 1.0) if feeds["free_clearance"] > 0 else 1.0
+        feed = feeds["min"] + (feeds["max"] - feeds["min"]) * share
+        if unit[2] < -0.7 and segment_clearance(p1[:3], p1[:3], obstacles, radius) < feeds["free_clearance"]:
+            feed = min(feed, feeds["approach"])
+        feed = min(feed, limits.along(unit)[0] * 60.0)
+        result.append(round(feed))
+    return result
+
+
+def _with_a(path, a0: float, a1: float):
+    """Spread a rotation from a0 to a1 over an (x, y, z) path, proportional to length"""
+    lengths = [math.dist(p, q) for p, q in zip(path, path[1:])]
+    total = sum(lengths) or 1.0
+    out, done = [(*path[0][:3], a0)], 0.0
+    for p, length in zip(path[1:], lengths):
+        done += length
+        out.append((*p[:3], a0 + (a1 - a0) * done / total))
+    return out
+
+
+def job_target(job: dict, position: dict, locations=None) -> dict:
+    """
+    Gantry position after a goto (absolute or named location) or step (relative) job.
+    Axes the job does not set keep their position value; pass nan for an unknown one.
+    """
+    params = job.get("params") if isinstance(job.get("params"), dict) else {}
+    if job.get("action") == "goto":
+        name = params.get("location")
+        loc = next((l for l in locations or [] if l.get("name") == name), params) if name else params
+        return {axis: float(loc.get(axis, position[axis])) for axis in AXES}
+    return {axis: position[axis] + float(params.get(axis, params.get("r", 0) if axis == "a" else 0))
+            for axis in AXES}
+
+
+def estimate_jobs(jobs: Dict[str, dict], start: dict, limits: Limits = None, locations=None,
+                  paths: Optional[Dict[str, List[tuple]]] = None,
+                  feeds: Optional[Dict[str, List[float]]] = None) -> dict:
+    """
+    Per-job and total predicted times, following the gantry through goto/step jobs.
+    Each gantry move starts and ends at rest (jobs run one at a time).
+    paths: optional {job_id: plan_path waypoints} timed instead of the straight move.
+    feeds: optional {job_id: per-segment F} (see feedrates) replacing the job speed.
+    Jobs of other machines have no motion model and are listed as unmodelled.
+    """
+    limits = limits or Limits()
+    position = {axis: float(start.get(axis, 0.0)) for axis in AXES}
+    results, unmodelled = {}, []
+    total = 0.0
+    for job_id, job in jobs.items():
+        action = job.get("action")
+        params = job.get("params") if isinstance(job.get("params"), dict) else {}
+        if job.get("machine") != "gantry":
+            unmodelled.append(job_id)
+            continue
+        if action in ACTION_S:
+            results[job_id] = {"time_s": ACTION_S[action]}
+            total += ACTION_S[action]
+            continue
+        if action not in ("goto", "step"):
+            unmodelled.append(job_id)
+            continue
+
+        target = job_target(job, position, locations)
+        speed = params.get("speed") or DEFAULT_SPEED
+
+        p0 = tuple(position[axis] for axis in AXES)
+        p1 = tuple(target[axis] for axis in AXES)
+        path = (paths or {}).get(job_id)
+        if path:
+            points = _with_a([p0[:3]] + [tuple(p) for p in path], p0[3], p1[3])
+        else:
+            points = [p0, p1]
+        estimate = estimate_path(points, (feeds or {}).get(job_id) or speed, limits)
+        results[job_id] = {"time_s": estimate["time_s"], "length_mm": estimate["length_mm"],
+                           "moves": len(estimate["segments"])}
+        total += estimate["time_s"]
+        position = target
+
+    return {
+        "profile": limits.profile,
+        "jobs": results,
+        "total_s": round(total, 3),
+        "unmodelled": unmodelled,
+    }
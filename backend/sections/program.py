@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .kinematics import AXES, DEFAULT_SPEED, UNKNOWN, job_target
+
+# Bump when the generated G-code changes, so cached programs are rebuilt
+VERSION = 2
+
+SYNC = "(sync "
+HEADER = "(program "
+
+
+def program_path(jobs_file: str) -> str:
+    """Program cache next to the jobs file: jobs_set1.json -> jobs_set1.gcode"""
+    return os.path.splitext(jobs_file)[0] + ".gcode"
+
+
+def source_hash(jobs: Dict[str, dict], locations=None) -> str:
+    """Hash of everything a compiled program depends on"""
+    data = json.dumps({"version": VERSION, "jobs": jobs, "locations": locations or []},
+                      sort_keys=True, default=str)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def _num(value) -> str:
+    return format(float(value), "g")
+
+
+def compile_jobs(jobs: Dict[str, dict], locations=None) -> List[str]:
+    """
+    G-code for a job list. Gantry goto/step/unlock jobs become G-code; every other
+    job (other machines, tool changes) becomes a "(sync <job id>)" marker where the
+    runner waits for the gantry to stop and then runs that job itself.
+    """
+    lines = []
+    mode = None
+    for job_id, job in jobs.items():
+        action = job.get("action")
+        params = job.get("params") if isinstance(job.get("params"), dict) else {}
+        if job.get("machine") != "gantry" or action not in ("goto", "step", "unlock"):
+            lines.append(f"{SYNC}{json.dumps(str(job_id))})")
+            mode = None  # the synced job may leave the gantry in either distance mode
+            continue
+        lines.append(f"(job {json.dumps(str(job_id))})")
+        if action == "unlock":
+            # the dwell runs in the TinyG planner, between the moves around it
+            lines += ["M8", f"G4 P{_num(params.get('time_s', 1.0))}", "M9"]
+            continue
+        speed = params.get("speed") or DEFAULT_SPEED
+        if action == "goto":
+            # axes the goto does not set are left out, so they keep their position
+            target = job_target(job, UNKNOWN, locations)
+            axes = {axis: value for axis, value in target.items() if not math.isnan(value)}
+            wanted = "G90"
+        else:
+            axes = job_target(job, {axis: 0.0 for axis in AXES}, locations)
+            wanted = "G91"
+        if mode != wanted:
+            lines.append(wanted)
+            mode = wanted
+        words = "".join(f"{axis.upper()}{_num(value)} " for axis, value in axes.items())
+        lines.append(f"G1 {words}F{_num(speed)}")
+    return lines
+
+
+def write_program(path: str, lines: List[str], digest: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(f"{HEADER}{digest})\n")
+        f.write("\n".join(lines))
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def read_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            first = f.readline().strip()
+    except OSError:
+        return None
+    if first.startswith(HEADER) and first.endswith(")"):
+        return first[len(HEADER):-1]
+    return None
+
+
+class ProgramFile:
+    """
+    Read-only memory map of a compiled program. blocks() yields
+    ("gcode", [lines]) runs to stream and ("sync", job_id) markers in file order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def blocks(self) -> Iterator[Tuple[str, object]]:
+        self._map.seek(0)
+        block = []
+        for raw in iter(self._map.readline, b""):
+            if raw.startswith(b"("):
+                if raw.startswith(SYNC.encode()):
+                    if block:
+                        yield "gcode", block
+                        block = []
+                    yield "sync", json.loads(raw[len(SYNC):].rstrip()[:-1])
+                continue  # header and job comments are never sent
+            line = raw.rstrip().decode()
+            if line:
+                block.append(line)
+        if block:
+            yield "gcode", block
+
+
+def run(program: ProgramFile, gantry, run_job: Callable[[str], None], timeout: float = 30.0) -> dict:
+    """
+    Stream the program's G-code through the gantry's flow-controlled streamer; at
+    each sync marker wait for the gantry to stop, then run_job(job_id). The gantry's
+    async transport, if open, is restored afterwards (see Gantry.streaming).
+    A line the controller rejects holds and flushes the gantry and raises RuntimeError.
+    """
+    sent = synced = 0
+    moving = False
+    with gantry.streaming():
+        for kind, payload in program.blocks():
+            if kind == "gcode":
+                commands = gantry.stream(payload, timeout=timeout)
+                if commands is False:
+                    raise RuntimeError("Gantry is not connected")
+                failed = next((i for i, cmd in enumerate(commands) if cmd.error), None)
+                if failed is not None:
+                    gantry.hold(flush=True)
+                    cmd = commands[failed]
+                    raise RuntimeError(f"Program stopped at G-code line {sent + failed + 1} '{cmd.line}': {cmd.error}")
+                sent += len(payload)
+                moving = True
+                continue
+            if moving:
+                gantry.wait_motion_complete()
+                moving = False
+            logging.info(f"program sync: job {payload}")
+            run_job(payload)
+            synced += 1
+        if moving:
+            gantry.wait_motion_complete()
+    return {"lines": sent, "synced_jobs": synced}
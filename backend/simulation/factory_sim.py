@@ -0,0 +1,269 @@
+"""
+Discrete-event simulation of a factory's job list.
+
+    python -m simulation.factory_sim examples/factory1.json --cycles 20
+    python -m simulation.factory_sim examples/factory1.json --jobs examples/jobs/jobs_set1.json
+
+Every machine is a resource working through its own jobs in list order. A job
+starts once its machine is free and the jobs it waits for are done: the ids in
+its "depends_on" list if it has one, otherwise the job before it (the order
+run_program executes in). Durations come from machine models: gantry moves
+from the kinematic model (sections.kinematics) following the toolend from its
+saved position, cobot moves from the largest joint rotation, gripper and
+screwdriver actions from their run times. Nothing is slept, so hours of
+production simulate in milliseconds.
+"""
+import argparse
+import heapq
+import json
+import logging
+import sys
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from sections import kinematics
+
+# Seconds for actions without a motion model; COMMAND_S is one request round trip
+COMMAND_S = 0.05
+ACTION_S = {
+    "gantry": dict(kinematics.ACTION_S),
+    "cobot280": {"fetchPositions": COMMAND_S, "get_position": COMMAND_S},
+    "gripper": {"open": 1.0, "close": 1.0, "speedUp": COMMAND_S, "speedDown": COMMAND_S,
+                "speed_up": COMMAND_S, "speed_down": COMMAND_S, "set_speed": COMMAND_S},
+    "arduino": {"screwIn": 3.0, "screwOut": 3.0},
+}
+DEFAULT_ACTION_S = 1.0
+
+# Jobs addressed to a device that is driven through another machine
+RESOURCES = {"screwdriver": "arduino"}
+
+# myCobot 280: joint speed at speed 100, settle time after a move
+COBOT = {"joint_speed": 160.0, "default_speed": 50, "settle_s": 0.3}
+
+
+class MachineModel:
+    """Fixed per-action durations; unknown actions take DEFAULT_ACTION_S and are reported"""
+
+    def __init__(self, name: str, actions: Dict[str, float] = None):
+        self.name = name
+        self.actions = actions or {}
+
+    def duration(self, job: dict) -> Tuple[float, bool]:
+        """(seconds, modelled) for one job; may update the model's state"""
+        action = job.get("action")
+        if action in self.actions:
+            return self.actions[action], True
+        return DEFAULT_ACTION_S, False
+
+
+class GantryModel(MachineModel):
+    """TinyG kinematic model; every move starts and ends at rest"""
+
+    def __init__(self, gantry, profile: str = "scurve"):
+        super().__init__("gantry", ACTION_S["gantry"])
+        self.limits = kinematics.Limits(gantry.limits, profile)
+        self.locations = gantry.locations
+        start = (gantry.toolend or {}).get("position") or {}
+        self.position = {axis: float(start.get(axis, 0.0)) for axis in kinematics.AXES}
+
+    def duration(self, job):
+        if job.get("action") not in ("goto", "step"):
+            return super().duration(job)
+        params = job.get("params") if isinstance(job.get("params"), dict) else {}
+        target = kinematics.job_target(job, self.position, self.locations)
+        points = [tuple(p[axis] for axis in kinematics.AXES) for p in (self.position, target)]
+        self.position = target
+        speed = params.get("speed") or kinematics.DEFAULT_SPEED
+        return kinematics.estimate_path(points, speed, self.limits)["time_s"], True
+
+
+class CobotModel(MachineModel):
+    """Joint moves take the largest rotation over the joint speed, plus settling"""
+
+    def __init__(self):
+        super().__init__("cobot280", ACTION_S["cobot280"])
+        self.angles = [0.0] * 6
+
+    def _move(self, target: List[float], speed) -> float:
+        rotation = max(abs(b - a) for a, b in zip(self.angles, target))
+        self.angles = target
+        scale = max(float(speed or COBOT["default_speed"]), 1.0) / 100.0
+        return rotation / (COBOT["joint_speed"] * scale) + COBOT["settle_s"]
+
+    def duration(self, job):
+        action = job.get("action")
+        params = job.get("params")
+        if isinstance(params, dict):
+            joints = [params.get(f"j{i + 1}", 0) for i in range(6)]
+            speed = params.get("speed")
+        elif isinstance(params, (list, tuple)) and len(params) == 6:
+            joints, speed = list(params), None
+        else:
+            return super().duration(job)
+        joints = [float(v) for v in joints]
+        if action in ("goto", "moveJoints", "set_angles", "move_to"):
+            return self._move(joints, speed), True
+        if action in ("step", "moveJoint", "set_angle"):
+            return self._move([a + d for a, d in zip(self.angles, joints)], speed), True
+        return super().duration(job)
+
+
+class TimedModel(MachineModel):
+    """Actions that run for a time_s/duration parameter (gripper motor, screwdriver)"""
+
+    def duration(self, job):
+        params = job.get("params") if isinstance(job.get("params"), dict) else {}
+        run_s = params.get("time_s", params.get("duration"))
+        if run_s:
+            return float(run_s) + COMMAND_S, True
+        return super().duration(job)
+
+
+def build_models(factory, profile: str = "scurve") -> Dict[str, MachineModel]:
+    models = {
+        "gantry": GantryModel(factory.machines["gantry"], profile),
+        "cobot280": CobotModel(),
+        "gripper": TimedModel("gripper", ACTION_S["gripper"]),
+        "arduino": TimedModel("arduino", ACTION_S["arduino"]),
+    }
+    for name in factory.machines:
+        models.setdefault(name, MachineModel(name))
+    return models
+
+
+def _dependencies(jobs: Dict[str, dict], cycles: int) -> Dict[tuple, List[tuple]]:
+    """{(cycle, job_id): [(cycle, job_id) it waits for]}"""
+    ids = [str(job_id) for job_id in jobs]
+    deps = {}
+    previous = None
+    for cycle in range(cycles):
+        for job_id, job in zip(ids, jobs.values()):
+            key = (cycle, job_id)
+            if job.get("depends_on") is not None:
+                deps[key] = [(cycle, str(dep)) for dep in job["depends_on"]]
+            else:
+                deps[key] = [previous] if previous else []
+            previous = key
+    return deps
+
+
+def simulate(factory, cycles: int = 1, profile: str = "scurve",
+             models: Optional[Dict[str, MachineModel]] = None, trace: bool = False) -> dict:
+    """
+    Run the factory's job list cycles times on machine models and report
+    makespan, cycles per hour and per-machine busy/idle time and utilization.
+    trace=True adds the start and end of every job of the first cycle.
+    """
+    t0 = time.perf_counter()
+    jobs = {str(job_id): job for job_id, job in factory.jobs.items()}
+    models = models or build_models(factory, profile)
+    deps = _dependencies(jobs, cycles)
+
+    queues: Dict[str, deque] = {}
+    for cycle in range(cycles):
+        for job_id, job in jobs.items():
+            name = RESOURCES.get(job.get("machine"), job.get("machine"))
+            if name not in models:
+                models[name] = MachineModel(name)
+            queues.setdefault(name, deque()).append((cycle, job_id))
+
+    now = 0.0
+    events = []                 # (end time, sequence, machine, job key)
+    running = {}                # machine -> job key
+    done = {}                   # job key -> end time
+    busy = {name: 0.0 for name in models}
+    counts = {name: 0 for name in models}
+    spans = {}
+    assumed = set()
+    seq = 0
+    while True:
+        # start every job at the head of an idle machine's queue whose dependencies are done
+        for name, waiting in queues.items():
+            if name in running or not waiting:
+                continue
+            key = waiting[0]
+            if any(dep not in done for dep in deps[key]):
+                continue
+            waiting.popleft()
+            seconds, modelled = models[name].duration(jobs[key[1]])
+            if not modelled:
+                assumed.add(key[1])
+            running[name] = key
+            busy[name] += seconds
+            counts[name] += 1
+            spans[key] = now
+            heapq.heappush(events, (now + seconds, seq, name, key))
+            seq += 1
+        if not events:
+            break
+        now, _, name, key = heapq.heappop(events)
+        done[key] = now
+        del running[name]
+
+    stuck = [key for waiting in queues.values() for key in waiting]
+    if stuck:
+        raise ValueError(f"Jobs never become ready (dependency cycle or unknown id): "
+                         f"{sorted({job_id for _, job_id in stuck})}")
+
+    makespan = now
+    machines = {
+        name: {
+            "jobs": counts[name],
+            "busy_s": round(busy[name], 3),
+            "idle_s": round(makespan - busy[name], 3),
+            "utilization": round(busy[name] / makespan, 4) if makespan else 0.0,
+        }
+        for name in models
+    }
+    wall = time.perf_counter() - t0
+    report = {
+        "cycles": cycles,
+        "jobs": len(jobs) * cycles,
+        "profile": profile,
+        "makespan_s": round(makespan, 3),
+        "cycle_s": round(makespan / cycles, 3) if cycles else 0.0,
+        "cycles_per_hour": round(3600.0 * cycles / makespan, 2) if makespan else None,
+        "machines": machines,
+        "assumed_duration": sorted(assumed),
+        "wall_s": round(wall, 4),
+        "speedup": round(makespan / wall, 1) if wall else None,
+    }
+    if trace:
+        report["trace"] = {
+            job_id: {"machine": jobs[job_id].get("machine"), "start_s": round(spans[(0, job_id)], 3),
+                     "end_s": round(done[(0, job_id)], 3)}
+            for job_id in jobs
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("factory", help="factory JSON (e.g. examples/factory1.json)")
+    parser.add_argument("--jobs", help="jobs file to simulate instead of the factory's own")
+    parser.add_argument("--cycles", type=int, default=1)
+    parser.add_argument("--profile", choices=kinematics.PROFILES, default="scurve")
+    parser.add_argument("--trace", action="store_true", help="include job start/end times of the first cycle")
+    parser.add_argument("--out", help="JSON output file (default: stdout)")
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    from sections.factory import Factory
+    factory = Factory().load_factory(args.factory)
+    if args.jobs:
+        factory.jobs_manager.load(args.jobs)
+    report = simulate(factory, args.cycles, args.profile, trace=args.trace)
+    print(f"makespan {report['makespan_s']} s, {report['cycles_per_hour']} cycles/h, "
+          f"simulated in {report['wall_s']} s", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
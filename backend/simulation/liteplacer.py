@@ -1,93 +1,111 @@
 import json
 import random
 import re
+from typing import List
 
+AXIS_WORD = re.compile(r"([XYZAB])([-+]?[0-9]*\.?[0-9]+)")
+LINE_NUMBER = re.compile(r"^N\d+\s*")
 
-# --- Simulated machine state ---
-_sim_state = {
-    "connected": False,
-    "position": {"x": 0.0, "y": 0.0, "z": 0.0, "a": 0.0},
-    "mode": "G90",  # absolute mode
-    "last_command": "",
-}
 
-def sim(command: str):
+class SimulatedTinyG:
     """
-    Simulate TinyG command execution when no hardware is connected.
-    This is used when connection is None or closed.
+    Simulated TinyG used when no hardware is connected.
+    Every instance keeps its own state, so any number of simulated gantries
+    can run side by side in one process. Moves complete instantly.
     """
-    global _sim_state
-    command = command.strip()
-    _sim_state["last_command"] = command
-
-    # print(command)
-
-    # Simulate basic responses
-    response_lines = []
-
-    # --- G-code interpretation ---
-    if command.startswith("G90"):
-        _sim_state["mode"] = "G90"
-        response_lines.append('{"stat":3,"msg":"absolute mode"}')
-
-    elif command.startswith("G91"):
-        _sim_state["mode"] = "G91"
-        response_lines.append('{"stat":3,"msg":"relative mode"}')
-
-    elif command.startswith("G92"):
-        # Example: G92 X0 Y0 Z0 A0
-        match = re.findall(r"([XYZAB])([-+]?[0-9]*\.?[0-9]+)", command)
-        for axis, val in match:
-            _sim_state["position"][axis.lower()] = float(val)
-        response_lines.append(json.dumps({
-            "msg": "position set", "pos": _sim_state["position"]
-        }))
-
-    elif command.startswith("G1") or command.startswith("G0"):
-        # Example: G1 X10 Y20 Z5 F1000
-        match = re.findall(r"([XYZAB])([-+]?[0-9]*\.?[0-9]+)", command)
-        for axis, val in match:
-            if _sim_state["mode"] == "G90":
-                _sim_state["position"][axis.lower()] = float(val)
-            else:
-                _sim_state["position"][axis.lower()] += float(val)
-
-        response_lines.append(json.dumps({
-            "msg": "simulated move complete",
-            "pos": _sim_state["position"]
-        }))
-
-    elif command == "$H":
-        # Home all axes
-        _sim_state["position"] = {"x": 0, "y": 0, "z": 0, "a": 0}
-        response_lines.append('{"msg":"homed all axes"}')
-
-    elif command == "!":
-        response_lines.append('{"msg":"feed hold (paused)"}')
-
-    elif command == "~":
-        response_lines.append('{"msg":"cycle start (resumed)"}')
-
-    elif command == "?":
-        # Status query
-        pos = _sim_state["position"]
-        response_lines = [
-            {"raw": f"X position: {pos['x']}"},
-            {"raw": f"Y position: {pos['y']}"},
-            {"raw": f"Z position: {pos['z']}"},
-            {"raw": f"A position: {pos['a']}"}
-        ]
-
-    else:
-        # Unknown command fallback
-        response_lines.append(json.dumps({
-            "msg": f"simulated ok for '{command}'"
-        }))
-
-    # Add a small fake delay
-    # time.sleep(random.uniform(0.01, 0.05))
-
-    return {
-        "connection": "simulated",
-        "status": response_lines,
-    }
+
+    def __init__(self):
+        self.connected = False
+        self.position = {"x": 0.0, "y": 0.0, "z": 0.0, "a": 0.0}
+        self.mode = "G90"  # absolute mode
+        self.last_command = ""
+
+    @property
+    def state(self) -> dict:
+        return {
+            "connected": self.connected,
+            "position": dict(self.position),
+            "mode": self.mode,
+            "last_command": self.last_command,
+        }
+
+    def execute(self, command: str) -> dict:
+        """Simulate one command; returns {"connection": "simulated", "status": [responses]}"""
+        command = command.strip()
+        self.last_command = command
+        # program lines may carry an N line number (see Gantry.run_program)
+        command = LINE_NUMBER.sub("", command)
+
+        # Simulate basic responses
+        response_lines = []
+
+        # --- G-code interpretation ---
+        if command.startswith("G90"):
+            self.mode = "G90"
+            response_lines.append('{"stat":3,"msg":"absolute mode"}')
+
+        elif command.startswith("G91"):
+            self.mode = "G91"
+            response_lines.append('{"stat":3,"msg":"relative mode"}')
+
+        elif command.startswith("G92"):
+            # Example: G92 X0 Y0 Z0 A0
+            for axis, val in AXIS_WORD.findall(command):
+                self.position[axis.lower()] = float(val)
+            response_lines.append(json.dumps({
+                "msg": "position set", "pos": self.position
+            }))
+
+        elif command.startswith("G1") or command.startswith("G0"):
+            # Example: G1 X10 Y20 Z5 F1000
+            for axis, val in AXIS_WORD.findall(command):
+                if self.mode == "G90":
+                    self.position[axis.lower()] = float(val)
+                else:
+                    self.position[axis.lower()] = self.position.get(axis.lower(), 0.0) + float(val)
+
+            response_lines.append(json.dumps({
+                "msg": "simulated move complete",
+                "pos": self.position
+            }))
+
+        elif command == "$H":
+            # Home all axes
+            self.position = {"x": 0.0, "y": 0.0, "z": 0.0, "a": 0.0}
+            response_lines.append('{"msg":"homed all axes"}')
+
+        elif command == "!":
+            response_lines.append('{"msg":"feed hold (paused)"}')
+
+        elif command == "~":
+            response_lines.append('{"msg":"cycle start (resumed)"}')
+
+        elif command == "?":
+            # Status query; moves finish instantly so the machine is always stopped
+            pos = self.position
+            response_lines = [
+                {"raw": f"X position: {pos['x']}"},
+                {"raw": f"Y position: {pos['y']}"},
+                {"raw": f"Z position: {pos['z']}"},
+                {"raw": f"A position: {pos['a']}"},
+                {"raw": "Machine state: Stop"},
+            ]
+
+        else:
+            # Unknown command fallback
+            response_lines.append(json.dumps({
+                "msg": f"simulated ok for '{command}'"
+            }))
+
+        # Add a small fake delay
+        # time.sleep(random.uniform(0.01, 0.05))
+
+        return {
+            "connection": "simulated",
+            "status": response_lines,
+        }
+
+    def readlines(self, command: str) -> List[str]:
+        """Response lines as Gantry.send reads them from a serial port"""
+        return [line["raw"] if isinstance(line, dict) else line
+                for line in self.execute(command)["status"]]
@@ -0,0 +1,436 @@
+"""
+Virtual TinyG on a pseudo-terminal.
+
+    python -m simulation.virtual_tinyg --time-scale 10
+
+prints a device path (e.g. /dev/pts/7) that Gantry.connect() can open like a
+real COM port. The simulator speaks the TinyG text and JSON protocols
+({"ej":1}), keeps a 28-deep planner whose moves take the time the kinematic
+model predicts for their feedrate (divided by time_scale), withholds the
+acknowledgement while the planner is full, and sends queue reports ($qv=1)
+and filtered status reports ({"sv":1}, {"si":ms}) in JSON mode. Realtime
+feed hold (!), cycle start (~), queue flush (%) and reset (ctrl-x) act
+immediately. Linux/macOS only (os.openpty).
+"""
+import argparse
+import json
+import math
+import os
+import queue
+import re
+import threading
+import time
+import tty
+from collections import deque
+
+from sections.kinematics import Limits, estimate_path
+
+STATES = {"ready": 1, "stop": 3, "run": 5, "hold": 6}
+STATE_NAMES = {1: "Ready", 3: "Stop", 5: "Run", 6: "Hold"}
+WORD = re.compile(r"([A-Z])\s*([-+]?[0-9]*\.?[0-9]+)")
+REPORT_FIELDS = ["line", "posx", "posy", "posz", "posa", "feed", "vel", "stat"]
+
+
+def relaxed_json(text: str):
+    """Parse TinyG's relaxed JSON: unquoted keys and the bare values t, f and n"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    text = re.sub(r'([{,])\s*([A-Za-z_][A-Za-z0-9_]*)\s*:', r'\1"\2":', text)
+    text = re.sub(r':\s*(t|f|n)\s*(?=[,}])',
+                  lambda m: ":" + {"t": "true", "f": "false", "n": "null"}[m.group(1)], text)
+    return json.loads(text)
+
+
+class Move:
+    """One planner buffer: a straight or arc move, a dwell or a synchronised M-code"""
+
+    def __init__(self, start, end, duration, line=None, feed=0.0, path=None):
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.line = line
+        self.feed = feed
+        self.path = path or [start, end]
+        self.elapsed = 0.0
+
+    def position(self):
+        if self.duration <= 0 or len(self.path) < 2:
+            return dict(self.end)
+        share = min(self.elapsed / self.duration, 1.0)
+        axes = "xyza"
+        # interpolate along the (possibly arc) polyline by index, good enough for reports
+        k = share * (len(self.path) - 1)
+        i = min(int(k), len(self.path) - 2)
+        f = k - i
+        return {axis: self.path[i][axis] + (self.path[i + 1][axis] - self.path[i][axis]) * f for axis in axes}
+
+
+class VirtualTinyG:
+    PLANNER_BUFFERS = 28
+
+    def __init__(self, time_scale: float = 1.0, limits: dict = None, tick: float = 0.005):
+        self.time_scale = time_scale
+        self.limits = Limits(limits)
+        self.tick = tick
+        self.master = self.slave = None
+        self.port = None
+        self._running = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._lines = queue.Queue()
+        self._threads = []
+        self._reset_state()
+        self.json_mode = False
+        self.stats = {"lines": 0, "moves": 0}
+
+    def _reset_state(self):
+        self.position = {"x": 0.0, "y": 0.0, "z": 0.0, "a": 0.0}
+        self.planned = dict(self.position)  # position at the end of the planner queue
+        self.absolute = True
+        self.feed = 0.0
+        self.line = 0
+        self.stat = STATES["ready"]
+        self.planner = deque()
+        self.hold = False
+        self.queue_reports = False
+        self.status_verbose = False
+        self.status_interval = 0.25
+        self.report_filter = list(REPORT_FIELDS)
+        self._last_report = {}
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def start(self) -> "VirtualTinyG":
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self._running = True
+        for target, name in ((self._read_loop, "vtinyg-rx"), (self._parse_loop, "vtinyg-parser"),
+                             (self._execute_loop, "vtinyg-planner"), (self._report_loop, "vtinyg-reports")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._lines.put(None)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+        self.master = self.slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # serial I/O
+    # ------------------------------------------------------------------
+    def _write(self, text: str):
+        with self._write_lock:
+            try:
+                os.write(self.master, (text + "\n").encode())
+            except OSError:
+                pass
+
+    def _read_loop(self):
+        buf = b""
+        while self._running:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                break
+            if not data:
+                continue
+            # realtime characters act as soon as they arrive, ahead of queued lines
+            for char in (b"!", b"~", b"%", b"\x18"):
+                if char in data:
+                    self._realtime(char.decode())
+                    data = data.replace(char, b"")
+            buf += data
+            while True:
+                match = re.search(rb"[\r\n]", buf)
+                if match is None:
+                    break
+                raw, buf = buf[:match.start()], buf[match.end():]
+                line = raw.decode(errors="ignore").strip()
+                if line:
+                    self._lines.put(line)
+
+    def _realtime(self, char: str):
+        with self._cond:
+            if char == "!" and self.planner:
+                self.hold = True
+                self.stat = STATES["hold"]
+            elif char == "~" and self.hold:
+                self.hold = False
+                self.stat = STATES["run"] if self.planner else STATES["stop"]
+            elif char == "%":
+                self.planner.clear()
+                self.hold = False
+                self.planned = dict(self.position)
+                self.stat = STATES["stop"]
+                self._queue_report()
+            elif char == "\x18":
+                json_mode = self.json_mode
+                self._reset_state()
+                self.json_mode = json_mode
+                while not self._lines.empty():
+                    self._lines.get_nowait()
+            self._cond.notify_all()
+        self._status_report(force=True)
+
+    # ------------------------------------------------------------------
+    # command interpretation
+    # ------------------------------------------------------------------
+    def _parse_loop(self):
+        while self._running:
+            line = self._lines.get()
+            if line is None:
+                break
+            self.stats["lines"] += 1
+            try:
+                if line.startswith("{"):
+                    self._json_command(line)
+                else:
+                    self._text_command(line)
+            except Exception as e:
+                self._reply(line, error=str(e))
+
+    def _reply(self, line: str, body: dict = None, error: str = None):
+        if self.json_mode:
+            self._write(json.dumps({"r": body or {}, "f": [1, 100 if error else 0, len(line) + 1]},
+                                   separators=(",", ":")))
+        elif error:
+            self._write(f"tinyg [mm] err: {error}")
+        else:
+            self._write("tinyg [mm] ok>")
+
+    def _json_command(self, line: str):
+        msg = relaxed_json(line)
+        body = {}
+        for key, value in msg.items():
+            if key == "ej":
+                self.json_mode = bool(value)
+                body[key] = int(self.json_mode)
+            elif key == "sr":  # null (n) or "" reads the report, a dict sets the filter
+                if isinstance(value, dict):
+                    self.report_filter = [k for k, on in value.items() if on]
+                body[key] = self._report_values()
+            elif key == "sv":
+                self.status_verbose = bool(value)
+                body[key] = int(value)
+            elif key == "si":
+                self.status_interval = max(float(value), 50.0) / 1000.0
+                body[key] = value
+            elif key == "qr":
+                body[key] = self.PLANNER_BUFFERS - len(self.planner)
+            elif key == "qv":
+                if value not in (None, ""):
+                    self.queue_reports = bool(value)
+                body[key] = int(self.queue_reports)
+            elif key == "gc":
+                self._gcode(value)
+                body[key] = value
+            else:
+                body[key] = value
+        self._reply(line, body)
+
+    def _text_command(self, line: str):
+        if line == "?":
+            pos = self._current_position()
+            for text in (f"X position: {pos['x']:.3f} mm", f"Y position: {pos['y']:.3f} mm",
+                         f"Z position: {pos['z']:.3f} mm", f"A position: {pos['a']:.3f} deg",
+                         f"Feed rate: {self.feed:.3f} mm/min", f"Velocity: {self._velocity():.3f} mm/min",
+                         f"Machine state: {STATE_NAMES.get(self.stat, self.stat)}"):
+                self._write(text)
+            self._reply(line)
+        elif line.startswith("$"):
+            if line.replace(" ", "").lower() in ("$qv=1", "$qv=2"):
+                self.queue_reports = True
+            elif line.replace(" ", "").lower() == "$qv=0":
+                self.queue_reports = False
+            self._reply(line)
+        else:
+            self._gcode(line)
+            self._reply(line, {"gc": line})
+
+    def _gcode(self, line: str):
+        words = [(letter, float(value)) for letter, value in WORD.findall(line.upper())]
+        number = next((int(v) for k, v in words if k == "N"), None)
+        codes = [(k, v) for k, v in words if k in "GM"]
+        axes = {k.lower(): v for k, v in words if k in "XYZA"}
+        offsets = {k: v for k, v in words if k in "IJ"}
+        feed = next((v for k, v in words if k == "F"), None)
+        if feed is not None:
+            self.feed = feed
+
+        motion = None
+        for letter, value in codes:
+            code = f"{letter}{value:g}"
+            if code == "G90":
+                self.absolute = True
+            elif code == "G91":
+                self.absolute = False
+            elif code == "G92":
+                with self._cond:
+                    self.position.update(axes)
+                    self.planned.update(axes)
+                return
+            elif code in ("G0", "G1", "G2", "G3"):
+                motion = code
+            elif code == "G4":
+                dwell = next((v for k, v in words if k == "P"), 0.0)
+                self._plan(Move(dict(self.planned), dict(self.planned), dwell, number))
+                return
+            elif letter == "M":
+                # spindle/coolant M-codes are synchronised with motion: a zero-length buffer
+                self._plan(Move(dict(self.planned), dict(self.planned), 0.0, number))
+                return
+        if motion is None or not axes:
+            return
+
+        start = dict(self.planned)
+        end = {axis: (axes[axis] if self.absolute else start[axis] + axes[axis]) if axis in axes else start[axis]
+               for axis in "xyza"}
+        path = [start, end]
+        if motion in ("G2", "G3"):
+            path = self._arc(start, end, offsets.get("I", 0.0), offsets.get("J", 0.0), motion == "G3")
+        feed = math.inf if motion == "G0" else (self.feed or 1.0)
+        points = [tuple(p[axis] for axis in "xyza") for p in path]
+        duration = estimate_path(points, min(feed, 1e9), self.limits)["time_s"]
+        self._plan(Move(start, end, duration, number, feed if motion != "G0" else 0.0, path))
+
+    @staticmethod
+    def _arc(start, end, i, j, ccw, pieces=16):
+        cx, cy = start["x"] + i, start["y"] + j
+        r = math.hypot(i, j)
+        a0 = math.atan2(start["y"] - cy, start["x"] - cx)
+        a1 = math.atan2(end["y"] - cy, end["x"] - cx)
+        sweep = (a1 - a0) % (2 * math.pi) if ccw else -((a0 - a1) % (2 * math.pi))
+        path = []
+        for k in range(pieces + 1):
+            t = k / pieces
+            path.append({"x": cx + r * math.cos(a0 + sweep * t), "y": cy + r * math.sin(a0 + sweep * t),
+                         "z": start["z"] + (end["z"] - start["z"]) * t,
+                         "a": start["a"] + (end["a"] - start["a"]) * t})
+        path[-1] = dict(end)
+        return path
+
+    def _plan(self, move: Move):
+        """Queue a planner buffer, waiting (and so withholding the ack) while all are in use"""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.planner) < self.PLANNER_BUFFERS or not self._running)
+            if not self._running:
+                return
+            self.planner.append(move)
+            self.planned = dict(move.end)
+            if not self.hold:
+                self.stat = STATES["run"]
+            self._queue_report()
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # execution and reports
+    # ------------------------------------------------------------------
+    def _execute_loop(self):
+        last = time.monotonic()
+        while self._running:
+            with self._cond:
+                self._cond.wait_for(lambda: (self.planner and not self.hold) or not self._running, 0.1)
+                now = time.monotonic()
+                dt, last = (now - last) * self.time_scale, now
+                if not self.planner or self.hold:
+                    continue
+                move = self.planner[0]
+                if move.elapsed == 0 and move.line is not None:
+                    self.line = move.line  # status reports show the executing line
+                move.elapsed += dt
+                if move.elapsed < move.duration:
+                    self.position = move.position()
+                    remaining = (move.duration - move.elapsed) / self.time_scale
+                else:
+                    self.planner.popleft()
+                    self.position = dict(move.end)
+                    self.stats["moves"] += 1
+                    self._queue_report()
+                    if not self.planner:
+                        self.stat = STATES["stop"]
+                    self._cond.notify_all()
+                    remaining = 0.0
+            if not self.planner:
+                self._status_report(force=True)
+            if remaining > 0:
+                time.sleep(min(self.tick, remaining))
+
+    def _current_position(self):
+        with self._cond:
+            return dict(self.position)
+
+    def _velocity(self) -> float:
+        with self._cond:
+            if self.stat != STATES["run"] or not self.planner:
+                return 0.0
+            move = self.planner[0]
+            length = math.dist([move.start[a] for a in "xyz"], [move.end[a] for a in "xyz"])
+            return length / move.duration * 60.0 if move.duration > 0 else 0.0
+
+    def _report_values(self) -> dict:
+        pos = self._current_position()
+        values = {"line": self.line, "posx": pos["x"], "posy": pos["y"], "posz": pos["z"], "posa": pos["a"],
+                  "feed": self.feed, "vel": round(self._velocity(), 3), "stat": self.stat}
+        return {key: round(values[key], 3) if isinstance(values[key], float) else values[key]
+                for key in self.report_filter if key in values}
+
+    def _queue_report(self):
+        if self.queue_reports and self.json_mode:
+            self._write(json.dumps({"qr": self.PLANNER_BUFFERS - len(self.planner)}))
+
+    def _status_report(self, force: bool = False):
+        """Send the status fields that changed since the last report (filtered reports, $sv=1)"""
+        if not (self.status_verbose and self.json_mode):
+            return
+        values = self._report_values()
+        changed = {k: v for k, v in values.items() if self._last_report.get(k) != v}
+        if changed and (force or self.stat == STATES["run"]):
+            self._last_report.update(changed)
+            self._write(json.dumps({"sr": changed}, separators=(",", ":")))
+
+    def _report_loop(self):
+        while self._running:
+            time.sleep(self.status_interval)
+            if self.stat == STATES["run"]:
+                self._status_report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="simulated seconds per real second (10 runs moves ten times faster)")
+    args = parser.parse_args(argv)
+    with VirtualTinyG(time_scale=args.time_scale) as vt:
+        print(vt.port, flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import math
+import random
+
+import pytest
+
+from aabb import AABB, IncrementalPlanner, astar_grid, astar_incremental, reset_incremental
+
+BOUNDS = ((0, 200), (0, 200))
+
+
+def cost(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+
+def random_box(rng):
+    x, y = rng.uniform(0, 180), rng.uniform(0, 180)
+    return AABB(x, y, 0, x + rng.uniform(5, 40), y + rng.uniform(5, 40), 20)
+
+
+def assert_same_plan(expected, path, start):
+    assert (expected is None) == (path is None)
+    if path is not None:
+        assert path[0] == start
+        assert cost(path) == pytest.approx(cost(expected))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_matches_astar_grid_across_edits(seed):
+    rng = random.Random(seed)
+    start = (rng.uniform(0, 200), rng.uniform(0, 200))
+    goal = (rng.uniform(0, 200), rng.uniform(0, 200))
+    obstacles = [random_box(rng) for _ in range(8)]
+    planner = IncrementalPlanner(start, goal, obstacles, BOUNDS, step=7, radius=2)
+    assert_same_plan(astar_grid(start, goal, obstacles, BOUNDS, step=7, radius=2), planner.plan(), start)
+    for _ in range(5):
+        change = rng.randrange(3)
+        if change == 0 and obstacles:
+            obstacles.pop(rng.randrange(len(obstacles)))
+        elif change == 1:
+            obstacles.append(random_box(rng))
+        else:
+            i = rng.randrange(len(obstacles))
+            o = obstacles[i]
+            obstacles[i] = AABB(o.xmin + 5, o.ymin - 3, 0, o.xmax + 5, o.ymax - 3, 20)
+        expected = astar_grid(start, goal, obstacles, BOUNDS, step=7, radius=2)
+        assert_same_plan(expected, planner.sync(obstacles), start)
+
+
+def test_incremental_plans_from_a_start_inside_an_obstacle_margin():
+    obstacles = [AABB(5.83, 3.2, 0, 13, 19, 10)]
+    bounds = ((0, 100), (0, 100))
+    expected = astar_grid((5, 5), (60, 60), obstacles, bounds, step=5, radius=2)
+    path = IncrementalPlanner((5, 5), (60, 60), obstacles, bounds, step=5, radius=2).plan()
+    assert expected is not None
+    assert_same_plan(expected, path, (5, 5))
+
+
+def test_astar_incremental_repairs_the_live_route():
+    reset_incremental()
+    obstacles = [AABB(60, 0, 0, 80, 120, 20)]
+    stats = {}
+    first = astar_incremental((10, 10), (150, 10), obstacles, BOUNDS, step=5, radius=2, stats=stats)
+    full = stats["expansions"]
+    obstacles.append(AABB(100, 150, 0, 110, 160, 20))  # far from the route
+    path = astar_incremental((10, 10), (150, 10), obstacles, BOUNDS, step=5, radius=2, stats=stats)
+    assert_same_plan(astar_grid((10, 10), (150, 10), obstacles, BOUNDS, step=5, radius=2), path, (10, 10))
+    assert cost(path) == pytest.approx(cost(first))
+    assert stats["expansions"] < full
+    reset_incremental()
@@ -0,0 +1,54 @@
+import math
+import re
+
+import pytest
+
+from aabb import AABB
+from sections.gcode import compile_path
+
+WORD = re.compile(r"([A-Z])(-?[\d.]+)")
+
+
+def words(line):
+    return {letter: float(value) for letter, value in WORD.findall(line)}
+
+
+def moves(lines):
+    return [line for line in lines if line.split()[0] in ("G1", "G2", "G3")]
+
+
+def test_corner_becomes_a_tangent_arc_within_tolerance():
+    lines = compile_path([(0, 0, 10), (50, 0, 10), (50, 50, 10)], 3000, tolerance=0.5)
+    codes = [line.split()[0] for line in moves(lines)]
+    assert codes == ["G1", "G3", "G1"]
+    start, arc = words(moves(lines)[0]), words(moves(lines)[1])
+    center = (start["X"] + arc["I"], arc["J"])
+    r = math.dist(center, (start["X"], 0))
+    assert math.dist(center, (arc["X"], arc["Y"])) == pytest.approx(r, abs=1e-3)
+    # the arc's furthest point from the corner is its midpoint, on the line to the center
+    assert math.dist((50, 0), center) - r <= 0.5 + 1e-6
+
+
+def test_collinear_points_are_merged_and_speeds_kept_per_segment():
+    lines = compile_path([(0, 0, 10), (25, 0, 10), (50, 0, 10), (50, 50, 10)], [3000, 3000, 1000])
+    assert len(moves(lines)) == 3
+    assert words(moves(lines)[1])["F"] == 1000  # the arc takes the lower of its two speeds
+
+
+def test_arc_into_an_obstacle_stays_a_corner():
+    lines = compile_path([(0, 0, 10), (50, 0, 10), (50, 50, 10)], 3000,
+                         obstacles=[AABB(49, -3, 0, 52, 3, 20)], radius=1)
+    assert [line.split()[0] for line in moves(lines)] == ["G1", "G1"]
+
+
+def test_a_axis_is_carried_and_rotating_corners_are_not_filleted():
+    points = [(0, 0, 10, 0), (50, 0, 10, 0), (50, 50, 10, 90), (100, 50, 10, 90), (100, 100, 10, 90)]
+    lines = moves(compile_path(points, 3000))
+    assert [line.split()[0] for line in lines] == ["G1", "G1", "G1", "G3", "G1"]
+    assert words(lines[1]) == {"G": 1, "Y": 50, "A": 90}
+    assert "A" not in words(lines[3])  # unchanged A is not repeated on the arc
+
+
+def test_a_change_on_collinear_points_is_not_merged():
+    lines = moves(compile_path([(0, 0, 10, 0), (25, 0, 10, 45), (50, 0, 10, 45)], 3000))
+    assert [words(line).get("A") for line in lines] == [45, None]
@@ -0,0 +1,67 @@
+from sections import job_order
+from sections.jobs import JobsManager
+
+HOLDERS = {"gripper": "holder1", "screwdriver": "holder2"}
+
+
+def goto(job_id, x, effector=None):
+    job = {"id": job_id, "machine": "gantry", "action": "goto",
+           "params": {"x": x, "y": 0, "z": 0, "a": 0, "speed": 3000}}
+    if effector:
+        job["effector"] = effector
+    return job
+
+
+def tool(job_id, action, target=None):
+    return {"id": job_id, "machine": "gantry", "action": action,
+            "params": {"target": target} if target else {}}
+
+
+def reordered(jobs, start_effector=""):
+    result = job_order.optimize(jobs, [], (0, 0), start_effector, HOLDERS)
+    manager = JobsManager()
+    manager.jobs = dict(jobs)
+    manager.reorder(result["order"], result["tool_changes"], HOLDERS)
+    return result, manager.jobs
+
+
+def test_reorder_keeps_the_original_tool_change_jobs():
+    jobs = {
+        "1": goto("1", 200),
+        "2": tool("2", "detach"),
+        "9": tool("9", "attach", "holder1"),
+        "10": goto("10", 300),
+        "11": goto("11", 10, effector="gripper"),
+        "12": tool("12", "detach"),
+    }
+    result, reordered_jobs = reordered(jobs, start_effector="gripper")
+    assert result["tool_changes"] == []
+    # no attach/detach job is recreated under a generated id
+    assert set(reordered_jobs) <= set(jobs)
+    assert list(reordered_jobs)[-1] in ("2", "12")
+
+
+def test_reorder_attaches_generated_tool_changes_by_holder_name():
+    jobs = {
+        "1": goto("1", 200, effector="screwdriver"),
+        "9": tool("9", "attach", "holder1"),
+        "10": goto("10", 300),
+        "11": goto("11", 210, effector="screwdriver"),
+        "12": tool("12", "detach"),
+    }
+    result, reordered_jobs = reordered(jobs)
+    assert result["tool_changes"] == [(0, "screwdriver")]
+    assert reordered_jobs["1_attach"]["params"] == {"target": "holder2"}
+    assert list(reordered_jobs) == ["1_attach", "1", "11", "9", "10", "12"]
+
+
+def test_optimize_treats_a_holder_and_its_effector_as_one():
+    jobs = {
+        "9": tool("9", "attach", "holder1"),
+        "1": goto("1", 100),
+        "2": goto("2", 50, effector="gripper"),
+    }
+    result = job_order.optimize(jobs, [], (0, 0), "", HOLDERS)
+    assert result["after"]["tool_changes"] == 1
+    assert result["order"][0] == "9"
+    assert result["tool_changes"] == []
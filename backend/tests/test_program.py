@@ -0,0 +1,61 @@
+import pytest
+
+from machines.gantry import Gantry
+from sections import program
+from simulation.virtual_tinyg import VirtualTinyG
+
+JOBS = {
+    "1": {"machine": "gantry", "action": "goto", "params": {"x": 10, "y": 0, "z": 0, "a": 0, "speed": 3000}},
+    "2": {"machine": "gripper", "action": "close", "params": {}},
+    "3": {"machine": "gantry", "action": "step", "params": {"x": 5, "y": 0, "z": 0, "a": 0, "speed": 3000}},
+    "4": {"machine": "gantry", "action": "step", "params": {"x": 5, "y": 0, "z": 0, "a": 0, "speed": 3000}},
+    "5": {"machine": "gantry", "action": "attach", "params": {"target": "holder1"}},
+}
+
+
+def write(tmp_path, lines, digest="abc"):
+    path = str(tmp_path / "jobs.gcode")
+    program.write_program(path, lines, digest)
+    return path
+
+
+def gantry_at_origin():
+    gantry = Gantry()
+    gantry.toolend = {"position": {"x": 0, "y": 0, "z": 0, "a": 0}, "effector": ""}
+    return gantry
+
+
+def test_blocks_split_gcode_at_sync_markers(tmp_path):
+    path = write(tmp_path, program.compile_jobs(JOBS))
+    assert program.read_digest(path) == "abc"
+    with program.ProgramFile(path) as prog:
+        blocks = list(prog.blocks())
+    assert [kind for kind, _ in blocks] == ["gcode", "sync", "gcode", "sync"]
+    assert blocks[1] == ("sync", "2") and blocks[3] == ("sync", "5")
+    assert blocks[0][1] == ["G90", "G1 X10 Y0 Z0 A0 F3000"]
+    # job comments are not streamed; the mode is restated after a sync job
+    assert blocks[2][1] == ["G91", "G1 X5 Y0 Z0 A0 F3000", "G1 X5 Y0 Z0 A0 F3000"]
+
+
+def test_run_streams_blocks_and_runs_synced_jobs(tmp_path):
+    path = write(tmp_path, program.compile_jobs(JOBS))
+    gantry = gantry_at_origin()
+    gantry.connect("sim", "", 0, "", 0)
+    synced = []
+    with program.ProgramFile(path) as prog:
+        result = program.run(prog, gantry, synced.append)
+    assert result == {"lines": 5, "synced_jobs": 2}
+    assert synced == ["2", "5"]
+
+
+def test_run_stops_at_a_rejected_line(tmp_path):
+    path = write(tmp_path, ["G90", "G1 X1 F3000", "{bad", "G1 X2 F3000", '(sync "7")'])
+    synced = []
+    with VirtualTinyG(time_scale=20) as vt:
+        gantry = gantry_at_origin()
+        gantry.connect("serial", "", 0, vt.port, 115200, timeout=0.1)
+        with program.ProgramFile(path) as prog, pytest.raises(RuntimeError, match="line 3 '{bad'"):
+            program.run(prog, gantry, synced.append, timeout=5)
+        gantry.stop_streaming()
+        gantry.connection.serial.close()
+    assert synced == []
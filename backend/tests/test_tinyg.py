@@ -0,0 +1,41 @@
+import json
+
+from machines.tinyg import TinyGStreamer, is_report, parse_ack, reply_report, reply_value, response_error
+
+
+def test_parse_ack_text_mode():
+    assert parse_ack("tinyg [mm] ok>") == (True, None)
+    assert parse_ack("tinyg [mm] err: bad number format") == (True, "tinyg [mm] err: bad number format")
+    assert parse_ack("X position: 1.000 mm") == (False, None)
+
+
+def test_parse_ack_json_footer_status():
+    ok = '{"r":{"gc":"G1 X1"},"f":[1,0,8]}'
+    failed = '{"r":{},"f":[1,100,5]}'
+    assert parse_ack(ok) == (True, None)
+    assert parse_ack(failed) == (True, failed)
+    assert parse_ack('{"sr":{"stat":5}}') == (False, None)
+    assert parse_ack("{not json") == (False, None)
+    assert response_error([ok, failed]) == failed
+
+
+def test_reply_report_reads_only_query_replies():
+    full = {"line": 3, "posx": 1.5, "stat": 3}
+    lines = ['{"sr":{"posx":1.0}}', json.dumps({"r": {"sr": full}, "f": [1, 0, 8]})]
+    assert reply_report(lines) == full
+    assert reply_report(['{"sr":{"posx":1.0}}']) is None
+    assert reply_report(['{"r":{"sr":5},"f":[1,0,8]}']) is None
+    assert reply_value(['{"r":{"qr":24},"f":[1,0,7]}'], "qr") == 24
+
+
+def test_is_report():
+    assert is_report('{"sr":{"stat":5}}') and is_report('{"qr":20}') and is_report('{"er":{}}')
+    assert not is_report('{"r":{"sr":{}},"f":[1,0,8]}')
+
+
+def test_query_reply_is_not_passed_to_on_report():
+    reports = []
+    streamer = TinyGStreamer(serial_port=None, on_report=reports.append)
+    streamer._dispatch('{"r":{"sr":{"stat":5,"posx":1.0}},"f":[1,0,8]}')
+    streamer._dispatch('{"sr":{"posx":2.0}}')
+    assert reports == [{"sr": {"posx": 2.0}}]
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+import serial
+
+from machines.tinyg import TinyGStreamer
+from simulation.virtual_tinyg import VirtualTinyG
+
+
+@pytest.fixture
+def tinyg():
+    with VirtualTinyG(time_scale=20) as vt:
+        port = serial.Serial(vt.port, 115200, timeout=0.1)
+        streamer = TinyGStreamer(port, max_outstanding=4).start()
+        yield vt, streamer
+        streamer.stop()
+        port.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_stream_acknowledges_every_line_in_order(tinyg):
+    vt, streamer = tinyg
+    lines = ["G91"] + [f"G1 X1 F{3000 + i}" for i in range(40)]
+    commands = streamer.stream(lines, timeout=10)
+    assert [cmd.line for cmd in commands] == lines
+    assert all(cmd.done.is_set() and cmd.error is None and cmd.response for cmd in commands)
+    assert [cmd.index for cmd in commands] == sorted(cmd.index for cmd in commands)
+    assert streamer.outstanding == 0
+    assert wait_for(lambda: not vt.planner and vt.position["x"] == pytest.approx(40))
+
+
+def test_queue_reports_keep_the_planner_from_overflowing(tinyg):
+    vt, streamer = tinyg
+    streamer.send('{"ej":1}')
+    streamer.send('{"qv":1}')  # {"qr":n} is pushed in JSON mode
+    depth = []
+    streamer.stream(["G91"] + ["G1 X0.5 F600"] * 40, timeout=10,
+                    on_progress=lambda i, cmd: depth.append(len(vt.planner)))
+    assert streamer.queue_free is not None
+    assert max(depth) <= VirtualTinyG.PLANNER_BUFFERS - streamer.low_water
+
+
+def test_rejected_line_sets_the_command_error(tinyg):
+    _, streamer = tinyg
+    commands = streamer.stream(["G90", "{bad", "G0 X1"], timeout=5)
+    assert [cmd.error is not None for cmd in commands] == [False, True, False]
+
+
+def test_flush_fails_the_outstanding_commands(tinyg):
+    vt, streamer = tinyg
+    streamer.send("G91")
+    commands = [streamer.submit("G1 X5 F300") for _ in range(3)]
+    streamer.write_realtime("!")
+    streamer.write_realtime("%")
+    for cmd in commands:
+        cmd.wait(5)
+    assert streamer.outstanding == 0
+    assert wait_for(lambda: not vt.planner)
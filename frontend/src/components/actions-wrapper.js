@@ -17,6 +17,9 @@ const recordable = (machine, action, fn) => {
 // Gantry
 export const goto = recordable('gantry', 'goto', GantryActions.goto);
 export const stepMove = recordable('gantry', 'step', GantryActions.stepMove);
+// jogs replay as step jobs
+export const jog = recordable('gantry', 'step', GantryActions.jog);
+export const jogCancel = GantryActions.jogCancel;
 export const handleUnlockToolChanger = recordable('gantry', 'unlock', GantryActions.handleUnlockToolChanger);
 export const attach = recordable('gantry', 'attach', GantryActions.attach);
 export const detach = recordable('gantry', 'detach', GantryActions.detach);
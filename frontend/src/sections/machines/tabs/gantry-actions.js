@@ -35,6 +35,30 @@ export const stepMove = async (req) => {
   }
 };
 
+// jog steps are merged server-side while earlier ones still run (see /gantry/jog)
+export const jog = async (req) => {
+  const { x, y, z, a, speed } = req;
+  try {
+    const res = await fetch("/api/gantry/jog", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ x, y, z, a, speed }),
+    });
+    console.log("Jog response:", await res.json());
+  } catch (err) {
+    console.error("Error jogging gantry:", err);
+  }
+};
+
+export const jogCancel = async () => {
+  try {
+    const res = await fetch("/api/gantry/jog/cancel", { method: "POST" });
+    console.log("Jog cancel response:", await res.json());
+  } catch (err) {
+    console.error("Error cancelling jog:", err);
+  }
+};
+
 export const getInfo = async () => {
   try {
     const res = await fetch("/api/gantry/get_info");
@@ -15,7 +15,7 @@ import {
   Typography,
 } from "@mui/material";
 import LockOpenIcon from '@heroicons/react/24/solid/LockOpenIcon';
-import { goto, getInfo, handleUnlockToolChanger, stepMove } from 'src/components/actions-wrapper';
+import { goto, getInfo, handleUnlockToolChanger, jog, jogCancel } from 'src/components/actions-wrapper';
 
 
 const GantryControls = ({ position, data, gotoPosition, setGotoPosition }) => {
@@ -108,7 +108,7 @@ const GantryControls = ({ position, data, gotoPosition, setGotoPosition }) => {
                     <Button size="small" sx={{ minWidth: 28 }}
                       onClick={() => {
                         const axisStep = { x: 0, y: 0, z: 0, a: 0, speed: speed, [axis]: -step[axis] || 0 };
-                        stepMove(axisStep);
+                        jog(axisStep);
                       }}>
                       -
                     </Button>
@@ -129,7 +129,7 @@ const GantryControls = ({ position, data, gotoPosition, setGotoPosition }) => {
                     <Button size="small" sx={{ minWidth: 28 }}
                       onClick={() => {
                         const axisStep = { x: 0, y: 0, z: 0, a: 0, speed: speed, [axis]: step[axis] || 0 };
-                        stepMove(axisStep);
+                        jog(axisStep);
                       }}>
                       +
                     </Button>
@@ -178,6 +178,10 @@ const GantryControls = ({ position, data, gotoPosition, setGotoPosition }) => {
             sx={{ minWidth: '30px', px: '12px' }}>
             GoTo
           </Button>
+          <Button variant="contained" color="error" onClick={jogCancel}
+            sx={{ minWidth: '30px', px: '12px' }}>
+            Stop
+          </Button>
           <TextField
             label="Speed"
             value={speed}